@@ -0,0 +1,159 @@
+"""Analytics shared by the Streamlit dashboard and the local API.
+
+Nothing in here imports streamlit, so the same numbers the dashboard shows can
+be computed from a plain Python process against the stored snapshot data.
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from correlation import pairwise_corr
+from panel import PricePanel
+
+DATA_DIR = Path(__file__).parent / "data"
+
+TICKERS = ["KLAR", "AFRM", "PYPL", "SQ", "^GSPC"]
+TICKER_LABELS = {"KLAR": "Klarna", "AFRM": "Affirm", "PYPL": "PayPal", "SQ": "Block", "^GSPC": "S&P 500"}
+
+
+# ── Price panels ──────────────────────────────────────────────────────────────
+
+def derive_panels(raw):
+    """Aligned prices, indexed prices (100 = each ticker's first close) and returns.
+
+    `raw` may hold pre-rename symbols (e.g. XYZ for SQ); they are stitched into
+    their canonical ticker. Late listings stay NaN instead of dropping rows.
+    """
+    panel = PricePanel(raw)
+    return panel.prices, panel.rebased(), panel.returns()
+
+
+def load_price_panel():
+    """PricePanel over the stored `stock_prices_raw.csv` snapshot."""
+    raw = pd.read_csv(DATA_DIR / "raw" / "stock_prices_raw.csv", index_col="Date", parse_dates=True)
+    return PricePanel(raw)
+
+
+def load_price_snapshot():
+    """Price panels from the stored `stock_prices_raw.csv` snapshot."""
+    panel = load_price_panel()
+    return panel.prices, panel.rebased(), panel.returns()
+
+
+def data_version():
+    """Short fingerprint of every stored data file; changes whenever one does.
+
+    Only raw/ and processed/ are scanned, not the version store under data/.
+    """
+    h = hashlib.sha1()
+    for path in sorted(p for sub in ("raw", "processed") for p in (DATA_DIR / sub).rglob("*.csv")):
+        stat = path.stat()
+        h.update(f"{path.relative_to(DATA_DIR)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+# ── Static fundamentals ───────────────────────────────────────────────────────
+
+def get_static_data():
+    """All fundamental + risk data hardcoded from public sources."""
+
+    klarna_annual = pd.DataFrame({
+        "year":             [2019, 2020, 2021, 2022, 2023, 2024, 2025],
+        "revenue_m":        [602,  845,  1204, 1850, 2277, 2810, 3500],
+        "net_income_m":     [-93,  -153, -688, -1047,-241,  55,  -200],
+        "gmv_b":            [35,   53,   80,   100,  90,   105,  130],
+        "active_users_m":   [70,   87,   90,   97,   100,  108,  114],
+        "merchants_k":      [190,  250,  400,  500,  550,  616,  850],
+        "headcount":        [3500, 4000, 6500, 7000, 5200, 4300, 3800],
+    })
+    klarna_annual["revenue_growth"] = klarna_annual["revenue_m"].pct_change() * 100
+    klarna_annual["arpu"] = klarna_annual["revenue_m"] / klarna_annual["active_users_m"]
+    klarna_annual["take_rate"] = klarna_annual["revenue_m"] / (klarna_annual["gmv_b"] * 1000) * 100
+
+    klarna_qtr = pd.DataFrame({
+        "quarter":       ["Q1 2024","Q2 2024","Q3 2024","Q4 2024","Q1 2025","Q2 2025","Q3 2025"],
+        "revenue_m":     [614, 706, 706, 784, 701, 823, 903],
+        "net_income_m":  [8,   12,  12,  30,  -60, -57, -95],
+        "gmv_b":         [22.0,24.5,26.2,31.0,27.0,29.5,32.7],
+        "users_m":       [100, 102, 105, 108, 109, 111, 114],
+        "merchants_k":   [500, 550, 616, 680, 720, 800, 850],
+    })
+
+    valuation = pd.DataFrame({
+        "event":        ["Series D","Series E","Peak","Down-round","Private","Pre-IPO","IPO Day 1","ATH","Current"],
+        "date":         ["Feb 2019","Sep 2020","Jun 2021","Jul 2022","Jul 2023","Jun 2024","Sep 10 2025","Dec 4 2025","Feb 11 2026"],
+        "valuation_b":  [5.5, 10.6, 45.6, 6.7, 9.0, 14.0, 17.0, 19.7, 7.82],
+        "price":        [None,None,None,None,None,None,45.82,57.20,19.75],
+    })
+
+    delinquency = pd.DataFrame({
+        "type":   ["BNPL official default","BNPL self-reported late","Overall consumer debt","Credit cards","Auto loans","Student loans 90+","Klarna charge-off"],
+        "rate":   [1.83, 41.0, 3.5, 8.8, 4.2, 7.7, 0.54],
+        "source": ["CFPB Dec 2025","LendingTree 2025","NY Fed Q1 2025","NY Fed Q1 2025","NY Fed Q1 2025","NY Fed Q1 2025","Klarna Q2 2025"],
+    })
+
+    late_pay = pd.DataFrame({
+        "demographic":  ["Gen Z (18-26)","Millennials (27-42)","Gen X (43-58)","Boomers (59+)"],
+        "rate_2024":    [44, 34, 8, 4],
+        "rate_2025":    [51, 38, 10, 5],
+    })
+
+    market_size = pd.DataFrame({
+        "year":        [2019,2020,2021,2022,2023,2024,2025,2026,2027,2028],
+        "global_b":    [35,  90, 186, 310, 420, 492, 560, 625, 695, 770],
+        "us_b":        [6,   20,  38,  60,  82, 103, 116.7,130,145,163.8],
+        "projected":   [False]*6 + [True]*4,
+    })
+
+    competitors = pd.DataFrame({
+        "company":      ["Klarna","Affirm","PayPal","Block/Afterpay"],
+        "ticker":       ["KLAR","AFRM","PYPL","SQ"],
+        "users_m":      [114, 21, 400, 20],
+        "rev_growth":   [26, 36, 5, 8],
+        "mktcap_b":     [7.82, 15.0, 72.0, 38.0],
+        "ps_ratio":     [2.24, 5.66, 2.32, 1.73],
+        "profitable":   [False, False, True, False],
+        "ret_since_ipo":[-51, 12, -18, -8],
+    })
+
+    return klarna_annual, klarna_qtr, valuation, delinquency, late_pay, market_size, competitors
+
+
+# ── Derived analytics ─────────────────────────────────────────────────────────
+
+def risk_return(returns, tickers=TICKERS):
+    """Annualised return and volatility (%) per ticker with at least two returns."""
+    rows = []
+    for t in tickers:
+        if t not in returns.columns:
+            continue
+        r = returns[t].dropna()
+        if len(r) > 1:
+            rows.append({
+                "ticker":     t,
+                "ann_return": r.mean() * 252 * 100,
+                "ann_vol":    r.std()  * np.sqrt(252) * 100,
+            })
+    return pd.DataFrame(rows, columns=["ticker", "ann_return", "ann_vol"])
+
+
+def correlation(returns, tickers=TICKERS, method="pearson"):
+    """Pairwise-complete returns correlation over the tickers present in `returns`."""
+    avail = [t for t in tickers if t in returns.columns]
+    return pairwise_corr(returns[avail], method=method)
+
+
+def stress_scenarios():
+    """Phantom-debt loss scenarios produced by notebook 03."""
+    return pd.read_csv(DATA_DIR / "processed" / "phantom_debt_scenarios.csv")
+
+
+def fundamentals_ratios(klarna_annual):
+    """Per-year growth, unit economics and margin ratios."""
+    ratios = klarna_annual[["year", "revenue_m", "revenue_growth", "arpu", "take_rate"]].copy()
+    ratios["net_margin"] = klarna_annual["net_income_m"] / klarna_annual["revenue_m"] * 100
+    ratios["revenue_per_employee_k"] = klarna_annual["revenue_m"] / klarna_annual["headcount"] * 1000
+    return ratios
@@ -0,0 +1,372 @@
+"""Local HTTP API serving the dashboard's analytics as JSON or Arrow.
+
+    python api.py --port 8600
+
+Endpoints (GET):
+    /v1/version                 data version fingerprint
+    /v1/risk-return             annualised return / volatility per ticker
+    /v1/correlation             returns correlation   ?tickers=KLAR,AFRM&method=spearman
+    /v1/correlation/clusters    cluster per ticker (0 = no overlapping history)
+                                ?shrinkage=ledoit-wolf|0..1&n_clusters=3
+    /v1/correlation/neighbours  top-k peers per ticker  ?k=5&shrinkage=ledoit-wolf
+    /v1/stress-scenarios        phantom-debt loss scenarios
+    /v1/fundamentals            Klarna annual ratios
+    /v1/panel/<kind>            prices | normalised | returns (streamed)
+                                ?tickers=KLAR,AFRM&start=2025-10-01&end=2026-01-31
+    /v1/export/<dataset>        prices | returns | rolling | scenarios as a file
+                                ?format=parquet|arrow|csv, same filters as /panel
+
+Every response carries an ETag derived from the data version and the request,
+so a matching If-None-Match gets a 304 before anything is computed. Small
+results are cached per data version in the shared budgeted cache; panels are
+streamed in row chunks. Add ?format=arrow (or Accept:
+application/vnd.apache.arrow.stream) for Arrow IPC instead of JSON. Exports
+default to Parquet and are written chunk by chunk by export.py. Everything
+is served from the stored snapshot in data/, so the API can be load-tested
+locally without network access.
+"""
+
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+from budget_cache import CACHE
+import correlation
+import export
+
+ARROW_MIME   = "application/vnd.apache.arrow.stream"
+JSON_MIME    = "application/json"
+CHUNK_ROWS   = 2000    # rows per streamed chunk / Arrow record batch
+PANEL_KINDS  = ("prices", "normalised", "returns")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ── Snapshot state ────────────────────────────────────────────────────────────
+
+class SnapshotStore:
+    """Analytics inputs for the current data version, reloaded when files change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.panel = None
+        self.panels = {}
+        self.klarna_annual = None
+
+    def refresh(self):
+        version = analytics.data_version()
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    panel = analytics.load_price_panel()
+                    self.panels = {"prices": panel.prices, "normalised": panel.rebased(), "returns": panel.returns()}
+                    self.panel = panel
+                    self.klarna_annual = analytics.get_static_data()[0]
+                    self.version = version
+        return self.version
+
+
+STORE = SnapshotStore()
+
+
+# ── Endpoint computations ─────────────────────────────────────────────────────
+
+def _tickers(params, default=analytics.TICKERS):
+    raw = params.get("tickers")
+    return [t.strip() for t in raw.split(",") if t.strip()] if raw else list(default)
+
+
+def risk_return_table(params):
+    return analytics.risk_return(STORE.panels["returns"], _tickers(params))
+
+
+def _method(params):
+    method = params.get("method", "pearson")
+    if method not in ("pearson", "spearman"):
+        raise ApiError(400, f"unknown method {method!r}")
+    return method
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+
+
+def _universe(params):
+    returns = STORE.panels["returns"]
+    return returns[[t for t in _tickers(params, returns.columns) if t in returns.columns]]
+
+
+def correlation_table(params):
+    corr = analytics.correlation(STORE.panels["returns"], _tickers(params), method=_method(params))
+    return corr.rename_axis("ticker").reset_index()
+
+
+def _shrinkage(params):
+    shrinkage = params.get("shrinkage") or None
+    if shrinkage not in (None, "ledoit-wolf"):
+        try:
+            shrinkage = float(shrinkage)
+        except ValueError:
+            raise ApiError(400, f"unknown shrinkage {shrinkage!r}")
+        if not 0.0 <= shrinkage <= 1.0:
+            raise ApiError(400, "shrinkage must be ledoit-wolf or an intensity in [0, 1]")
+    return shrinkage
+
+
+def cluster_table(params):
+    shrinkage = _shrinkage(params)
+    n_clusters = _int_param(params, "n_clusters", 0)
+    if n_clusters < 0:
+        raise ApiError(400, "n_clusters must be at least 1 (or 0 for automatic)")
+    corr, labels = correlation.clustered_correlation(_universe(params), method=_method(params),
+                                                     shrinkage=shrinkage, n_clusters=n_clusters or None)
+    return labels.rename("cluster").rename_axis("ticker").reset_index()
+
+
+def neighbours_table(params):
+    k = _int_param(params, "k", 5)
+    if k < 1:
+        raise ApiError(400, "k must be at least 1")
+    return correlation.top_k_neighbours(_universe(params), k=k, method=_method(params),
+                                        shrinkage=_shrinkage(params))
+
+
+def stress_scenarios_table(params):
+    return analytics.stress_scenarios()
+
+
+def fundamentals_table(params):
+    return analytics.fundamentals_ratios(STORE.klarna_annual)
+
+
+TABLES = {
+    "/v1/risk-return":            risk_return_table,
+    "/v1/correlation":            correlation_table,
+    "/v1/correlation/clusters":   cluster_table,
+    "/v1/correlation/neighbours": neighbours_table,
+    "/v1/stress-scenarios":       stress_scenarios_table,
+    "/v1/fundamentals":           fundamentals_table,
+}
+
+
+def _dates(params):
+    try:
+        start = pd.Timestamp(params["start"]) if "start" in params else None
+        end   = pd.Timestamp(params["end"]) if "end" in params else None
+    except ValueError as e:
+        raise ApiError(400, f"bad date: {e}")
+    if start is not None and end is not None and start > end:
+        raise ApiError(400, "start is after end")
+    return start, end
+
+
+def route(path):
+    """(endpoint kind, target) for a request path; 404 for anything unknown."""
+    if path == "/v1/version":
+        return "version", None
+    if path in TABLES:
+        return "table", TABLES[path]
+    for prefix, kind, names in (("/v1/panel/", "panel", PANEL_KINDS), ("/v1/export/", "export", export.DATASETS)):
+        name = path.removeprefix(prefix)
+        if path.startswith(prefix) and name in names:
+            return kind, name
+    raise ApiError(404, f"no such endpoint {path!r}")
+
+
+def panel_view(kind, params):
+    """Filtered view of a panel; selection happens before anything is encoded."""
+    df = STORE.panels[kind]
+    tickers = [t for t in _tickers(params, df.columns) if t in df.columns]
+    rows = STORE.panel.rows(*_dates(params))
+    if kind == "returns":
+        # Returns start on the calendar's second session
+        rows = slice(max(rows.start - 1, 0), max(rows.stop - 1, 0))
+    view = df.iloc[rows][tickers]
+    return view.rename_axis("date").reset_index()
+
+
+# ── Encoding ──────────────────────────────────────────────────────────────────
+
+def encode_json(df):
+    return df.to_json(orient="records", date_format="iso").encode()
+
+
+def encode_arrow(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class _ChunkedSink(io.RawIOBase):
+    """File-like adapter that frames every write as an HTTP/1.1 chunk."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        return len(data)
+
+
+def stream_json(df, sink):
+    sink.write(b"[")
+    for i, start in enumerate(range(0, len(df), CHUNK_ROWS)):
+        records = df.iloc[start:start + CHUNK_ROWS].to_json(orient="records", date_format="iso")
+        sink.write((b"," if i else b"") + records[1:-1].encode())
+    sink.write(b"]")
+
+
+def stream_arrow(df, sink):
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for start in range(0, len(df), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+# ── HTTP handler ──────────────────────────────────────────────────────────────
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "bnpl-analytics/1"
+
+    def do_GET(self):
+        self._headers_sent = False
+        try:
+            self._dispatch()
+        except ApiError as e:
+            self._send_error(e.status, str(e))
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            if self._headers_sent:
+                self.close_connection = True     # mid-stream: the client sees a truncated body
+            else:
+                self._send_error(500, f"{type(e).__name__}: {e}")
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        endpoint, target = route(url.path)          # unknown paths 404 before any ETag match
+        default = "parquet" if endpoint == "export" else "json"
+        fmt = params.pop("format", None) or ("arrow" if ARROW_MIME in self.headers.get("Accept", "") else default)
+        if fmt not in (export.MIME if endpoint == "export" else ("json", "arrow")):
+            raise ApiError(406, f"unsupported format {fmt!r}")
+
+        version = STORE.refresh()
+        request_key = (version, url.path, tuple(sorted(params.items())), fmt)
+        request_hash = hashlib.sha1(repr(request_key).encode()).hexdigest()
+        etag = '"' + request_hash[:24] + '"'
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            return self._send_not_modified(etag)
+
+        mime = ARROW_MIME if fmt == "arrow" else JSON_MIME
+        if endpoint == "version":
+            return self._send_body(200, JSON_MIME, json.dumps({"version": version}).encode(), etag)
+
+        if endpoint == "table":
+            body = CACHE.get("api", request_hash)
+            if body is None:
+                df = target(params)
+                body = encode_arrow(df) if fmt == "arrow" else encode_json(df)
+                CACHE.put("api", request_hash, body)
+            return self._send_body(200, mime, body, etag)
+
+        if endpoint == "panel":
+            view = panel_view(target, params)
+            self._send_headers(200, mime, etag, chunked=True)
+            sink = _ChunkedSink(self.wfile)
+            (stream_arrow if fmt == "arrow" else stream_json)(view, sink)
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        if endpoint == "export":
+            start, end = _dates(params)
+            tickers = _tickers(params) if "tickers" in params else None
+            window = _int_param(params, "window", 20)
+            if window < 1:
+                raise ApiError(400, "window must be at least 1")
+            chunks = export.iter_dataset(target, tickers, start, end, window=window)
+            # Build the first chunk before committing to a 200, so bad input still gets an error status
+            chunks = itertools.chain([next(chunks)], chunks)
+            self._send_headers(200, export.MIME[fmt], etag, chunked=True,
+                               filename=f"{target}.{fmt}")
+            export.write_chunks(chunks, pa.PythonFile(_ChunkedSink(self.wfile), mode="w"), fmt)
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _send_headers(self, status, mime, etag=None, length=None, chunked=False, filename=None):
+        self._headers_sent = True
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        if filename:
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        elif length is not None:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _send_body(self, status, mime, body, etag=None):
+        self._send_headers(status, mime, etag, length=len(body))
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_body(status, JSON_MIME, json.dumps({"error": message}).encode())
+
+    def _send_not_modified(self, etag):
+        self._headers_sent = True
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8600):
+    STORE.refresh()
+    server = ThreadingHTTPServer((host, port), AnalyticsHandler)
+    print(f"BNPL analytics API on http://{host}:{port} (data version {STORE.version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -5,7 +5,19 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import yfinance as yf
+import io
+import os
 import warnings
+from budget_cache import CACHE, cached
+from analytics import DATA_DIR, TICKER_LABELS, TICKERS, derive_panels, get_static_data, risk_return
+from correlation import clustered_correlation, top_k_neighbours
+from factors import MARKET, MIN_OBS, attribution, factor_fits, factor_returns
+from panel import last_close, source_symbols
+from valuation import DEFAULT_RANGES, base_case, grid_axes, price_distribution, scenario_grid, sensitivity
+from live_quotes import FakeQuoteFeed, QuoteStream, YFinanceQuoteFeed
+from warmup import WarmupScheduler, market_is_open
+from versions import STATIC_NAMES, VersionStore, commit_snapshot
+import export
 warnings.filterwarnings('ignore')
 
 # ── Page Config ───────────────────────────────────────────────────────────────
@@ -34,6 +46,9 @@ TICKER_COLORS = {
     "^GSPC": MUTED,
 }
 
+HEATMAP_MAX_TICKERS = 30   # above this the correlation tab shows nearest neighbours only
+DOWNLOAD_MAX_MB     = int(os.environ.get("BNPL_DOWNLOAD_MAX_MB", 50))   # larger exports: export.py or /v1/export
+
 PLOTLY_TEMPLATE = dict(
     layout=dict(
         paper_bgcolor=BG,
@@ -128,83 +143,140 @@ button[data-baseweb="tab"][aria-selected="true"] { color: #E8C56D !important; bo
 # DATA LOADING
 # ══════════════════════════════════════════════════════════════════════════════
 
-@st.cache_data(ttl=3600, show_spinner="Fetching live market data...")
+@cached("market", ttl=3600)
 def load_stock_data():
-    tickers = ["KLAR", "AFRM", "PYPL", "SQ", "^GSPC"]
     try:
-        raw = yf.download(tickers, start="2025-09-10", auto_adjust=True, progress=False)
-        prices = raw["Close"].copy()
-        prices.columns.name = None
-        prices_norm = prices.div(prices.iloc[0]) * 100
-        returns = prices.pct_change().dropna()
-        return prices, prices_norm, returns
+        raw = yf.download(source_symbols(TICKERS), start="2025-09-10", auto_adjust=True, progress=False)
+        closes = raw["Close"].copy()
+        closes.columns.name = None
+        return derive_panels(closes)
     except Exception:
         return None, None, None
 
 
-def get_static_data():
-    """All fundamental + risk data hardcoded from public sources."""
-
-    klarna_annual = pd.DataFrame({
-        "year":             [2019, 2020, 2021, 2022, 2023, 2024, 2025],
-        "revenue_m":        [602,  845,  1204, 1850, 2277, 2810, 3500],
-        "net_income_m":     [-93,  -153, -688, -1047,-241,  55,  -200],
-        "gmv_b":            [35,   53,   80,   100,  90,   105,  130],
-        "active_users_m":   [70,   87,   90,   97,   100,  108,  114],
-        "merchants_k":      [190,  250,  400,  500,  550,  616,  850],
-        "headcount":        [3500, 4000, 6500, 7000, 5200, 4300, 3800],
-    })
-    klarna_annual["revenue_growth"] = klarna_annual["revenue_m"].pct_change() * 100
-    klarna_annual["arpu"] = klarna_annual["revenue_m"] / klarna_annual["active_users_m"]
-    klarna_annual["take_rate"] = klarna_annual["revenue_m"] / (klarna_annual["gmv_b"] * 1000) * 100
-
-    klarna_qtr = pd.DataFrame({
-        "quarter":       ["Q1 2024","Q2 2024","Q3 2024","Q4 2024","Q1 2025","Q2 2025","Q3 2025"],
-        "revenue_m":     [614, 706, 706, 784, 701, 823, 903],
-        "net_income_m":  [8,   12,  12,  30,  -60, -57, -95],
-        "gmv_b":         [22.0,24.5,26.2,31.0,27.0,29.5,32.7],
-        "users_m":       [100, 102, 105, 108, 109, 111, 114],
-        "merchants_k":   [500, 550, 616, 680, 720, 800, 850],
-    })
-
-    valuation = pd.DataFrame({
-        "event":        ["Series D","Series E","Peak","Down-round","Private","Pre-IPO","IPO Day 1","ATH","Current"],
-        "date":         ["Feb 2019","Sep 2020","Jun 2021","Jul 2022","Jul 2023","Jun 2024","Sep 10 2025","Dec 4 2025","Feb 11 2026"],
-        "valuation_b":  [5.5, 10.6, 45.6, 6.7, 9.0, 14.0, 17.0, 19.7, 7.82],
-        "price":        [None,None,None,None,None,None,45.82,57.20,19.75],
-    })
-
-    delinquency = pd.DataFrame({
-        "type":   ["BNPL official default","BNPL self-reported late","Overall consumer debt","Credit cards","Auto loans","Student loans 90+","Klarna charge-off"],
-        "rate":   [1.83, 41.0, 3.5, 8.8, 4.2, 7.7, 0.54],
-        "source": ["CFPB Dec 2025","LendingTree 2025","NY Fed Q1 2025","NY Fed Q1 2025","NY Fed Q1 2025","NY Fed Q1 2025","Klarna Q2 2025"],
-    })
-
-    late_pay = pd.DataFrame({
-        "demographic":  ["Gen Z (18-26)","Millennials (27-42)","Gen X (43-58)","Boomers (59+)"],
-        "rate_2024":    [44, 34, 8, 4],
-        "rate_2025":    [51, 38, 10, 5],
-    })
-
-    market_size = pd.DataFrame({
-        "year":        [2019,2020,2021,2022,2023,2024,2025,2026,2027,2028],
-        "global_b":    [35,  90, 186, 310, 420, 492, 560, 625, 695, 770],
-        "us_b":        [6,   20,  38,  60,  82, 103, 116.7,130,145,163.8],
-        "projected":   [False]*6 + [True]*4,
-    })
-
-    competitors = pd.DataFrame({
-        "company":      ["Klarna","Affirm","PayPal","Block/Afterpay"],
-        "ticker":       ["KLAR","AFRM","PYPL","SQ"],
-        "users_m":      [114, 21, 400, 20],
-        "rev_growth":   [26, 36, 5, 8],
-        "mktcap_b":     [7.82, 15.0, 72.0, 38.0],
-        "ps_ratio":     [2.24, 5.66, 2.32, 1.73],
-        "profitable":   [False, False, True, False],
-        "ret_since_ipo":[-51, 12, -18, -8],
-    })
-
-    return klarna_annual, klarna_qtr, valuation, delinquency, late_pay, market_size, competitors
+@cached("analytics", ttl=3600)
+def factor_model(returns, window):
+    """Factors plus rolling and full-sample fits for every non-market ticker.
+
+    `factors` is the full-basket factor set used for KLAR's attribution; sector
+    peers are fitted against leave-one-out sector factors.
+    """
+    return factor_returns(returns), factor_fits(returns, window), factor_fits(returns)
+
+
+VERSIONS = VersionStore()
+
+
+@cached("versions")
+def load_version(manifest):
+    """Price panels, static tables and risk/return exactly as committed in `manifest`."""
+    panels = derive_panels(VERSIONS.load(manifest, "prices"))
+    static_data = tuple(VERSIONS.load(manifest, name) for name in STATIC_NAMES)
+    return panels, static_data, VERSIONS.load(manifest, "risk_return")
+
+
+@cached("analytics", ttl=3600)
+def correlation_matrix(returns, method, shrinkage):
+    return clustered_correlation(returns, method=method, shrinkage=shrinkage)
+
+
+@cached("analytics", ttl=3600)
+def correlation_neighbours(returns, method, shrinkage, k=5):
+    return top_k_neighbours(returns, k=k, method=method, shrinkage=shrinkage)
+
+
+FACTOR_WINDOWS = range(20, 121, 10)         # rolling-window slider values
+PRICE_WINDOWS  = ["1M", "3M", "All"]
+
+
+@cached("figures", ttl=3600)
+def build_klar_price_figure(prices, window):
+    klar_px = prices["KLAR"]
+    if window != "All":
+        start = klar_px.index[-1] - pd.DateOffset(months=int(window[0]))
+        klar_px = klar_px[klar_px.index >= start]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=klar_px.index, y=klar_px,
+        fill="tozeroy",
+        fillcolor="rgba(232,197,109,0.07)",
+        line=dict(color=GOLD, width=2),
+        name="KLAR",
+        hovertemplate="<b>%{x|%b %d}</b><br>$%{y:.2f}<extra></extra>",
+    ))
+    # Key level lines
+    fig.add_hline(y=40, line_dash="dash", line_color=MUTED, annotation_text="IPO Price $40", annotation_font_size=10)
+    fig.add_hline(y=57.20, line_dash="dot", line_color=GOLD, annotation_text="ATH $57.20", annotation_font_size=10)
+    fig.update_layout(
+        **PLOTLY_TEMPLATE["layout"],
+        height=400, yaxis_title="Price (USD)",
+        title=dict(text="Klarna (KLAR) — Post-IPO Price History", font=dict(color="white", size=13)),
+    )
+    return fig
+
+
+# ── Background warm-up ────────────────────────────────────────────────────────
+def _warm_market(results):
+    return [("prices", load_stock_data.refresh), ("static data", get_static_data)]
+
+
+def _warm_analytics(results):
+    prices, _, returns = results.get("prices") or (None, None, None)
+    if returns is None:
+        return []          # fetch failed: keep serving whatever is cached
+    jobs = [(f"factors {w}d", lambda w=w: factor_model.refresh(returns, w)) for w in FACTOR_WINDOWS]
+    jobs += [(f"correlation {m}/{s or 'raw'}", lambda m=m, s=s: correlation_matrix.refresh(returns, m, s))
+             for m in ("pearson", "spearman") for s in (None, "ledoit-wolf")]
+    if results.get("static data") is not None:
+        kl_annual, _, valuation = results["static data"][:3]
+        base = base_case(kl_annual, valuation, last_close(prices, "KLAR"))     # same key as the Verdict tab
+        jobs.append(("scenario grid", lambda: scenario_grid.refresh(
+            base, *grid_axes(**DEFAULT_RANGES), horizon=3, discount=10.0)))
+        jobs.append(("version snapshot", lambda: commit_snapshot(VERSIONS, prices, results["static data"])))
+    return jobs
+
+
+def _warm_figures(results):
+    prices = (results.get("prices") or (None,))[0]
+    if prices is None or "KLAR" not in prices.columns:
+        return []
+    return [(f"KLAR price {w}", lambda w=w: build_klar_price_figure.refresh(prices, w)) for w in PRICE_WINDOWS]
+
+
+@st.cache_resource(show_spinner=False)
+def get_warmup():
+    """One warm-up worker per process, started by the first page load.
+
+    Its first run overlaps that load: both go through the same single-flight
+    cache locks, so nothing is fetched twice, but that first visitor still
+    waits for the cold fetch.
+    """
+    stages = [("market data", _warm_market), ("analytics", _warm_analytics), ("figures", _warm_figures)]
+    return WarmupScheduler(stages).start()
+
+
+if os.environ.get("BNPL_WARMUP", "1") != "0":
+    warmup = get_warmup()
+else:
+    warmup = None
+
+
+# ── Live quotes ───────────────────────────────────────────────────────────────
+LIVE_INTERVAL = int(os.environ.get("BNPL_LIVE_INTERVAL", 15))   # seconds
+LIVE_POINTS   = 200                                             # live ticks kept on the KLAR chart
+
+
+@st.cache_resource(show_spinner=False)
+def get_quote_stream(feed_name):
+    """One poller per process, shared by every session that turns live mode on."""
+    if feed_name == "fake":
+        # Local random walk seeded from the stored price snapshot
+        snapshot = pd.read_csv(DATA_DIR / "raw" / "stock_prices_raw.csv", index_col="Date")
+        feed = FakeQuoteFeed(snapshot.ffill().iloc[-1].dropna().to_dict())
+    else:
+        feed = YFinanceQuoteFeed(TICKERS)
+    return QuoteStream(feed, interval=LIVE_INTERVAL).start()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -229,8 +301,16 @@ with st.sidebar:
     st.markdown("**Live Data**")
     refresh = st.button("🔄 Refresh Market Data")
     if refresh:
-        st.cache_data.clear()
+        CACHE.clear()
         st.rerun()
+    versions = VERSIONS.versions()
+    as_of = st.date_input("As of", value=None, key="as_of",
+                          min_value=versions[0] if versions else None,
+                          help="Show the data exactly as stored on this date. Leave empty for live data.")
+    version = VERSIONS.resolve(as_of) if as_of else None
+    live_mode = st.toggle("Live quotes", value=False, disabled=version is not None,
+                          help=f"Poll quotes every {LIVE_INTERVAL}s and update the KPIs and KLAR chart in place.")
+    live_mode = live_mode and version is None
 
     st.markdown("---")
     st.markdown("""
@@ -249,11 +329,25 @@ with st.sidebar:
 
 
 # ── Load data ─────────────────────────────────────────────────────────────────
-prices, prices_norm, returns = load_stock_data()
-kl_annual, kl_qtr, valuation, delinquency, late_pay, market_size, competitors = get_static_data()
+if version is not None:
+    (prices, prices_norm, returns), static_data, stored_risk = load_version(VERSIONS.manifest(version))
+else:
+    with st.spinner("Fetching live market data..."):
+        prices, prices_norm, returns = load_stock_data()
+    static_data, stored_risk = get_static_data(), None
+kl_annual, kl_qtr, valuation, delinquency, late_pay, market_size, competitors = static_data
 
 live_data_ok = prices is not None
 
+# Live mode: fragments below re-run on this interval and read from the shared stream
+quotes     = get_quote_stream(os.environ.get("BNPL_QUOTE_FEED", "yfinance")) if live_mode else None
+live_every = LIVE_INTERVAL if live_mode else None
+
+if as_of and version is None:
+    st.warning(f"No stored version on or before {as_of:%b %d, %Y}; showing live data.")
+elif version is not None:
+    st.info(f"Showing data as stored on **{version:%b %d, %Y}**. Commentary text is from the Feb 2026 write-up.")
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # SECTION: OVERVIEW
@@ -264,10 +358,20 @@ if section == "🏠 Overview":
     st.markdown('<p class="hero-sub">Klarna\'s IPO collapse, the Buy Now Pay Later debt trap, and what $560B in consumer credit tells us about the future of fintech.</p>', unsafe_allow_html=True)
     st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
+    @st.fragment(run_every=live_every)
+    def klar_current_metric():
+        live_px = quotes.latest("KLAR") if quotes else None
+        if live_px is None and version is not None and live_data_ok and prices["KLAR"].notna().any():
+            live_px = float(prices["KLAR"].dropna().iloc[-1])       # close on the as-of date
+        if live_px is None:
+            st.metric("KLAR Current", "$19.75", "-65% from ATH", delta_color="inverse")
+        else:
+            st.metric("KLAR Current", f"${live_px:.2f}", f"{(live_px/57.20-1)*100:.0f}% from ATH", delta_color="inverse")
+
     # KPI Row
     c1, c2, c3, c4, c5 = st.columns(5)
     with c1:
-        st.metric("KLAR Current", "$19.75", "-65% from ATH", delta_color="inverse")
+        klar_current_metric()
     with c2:
         st.metric("IPO Price", "$40.00", "+15% day one")
     with c3:
@@ -344,39 +448,65 @@ elif section == "📈 Klarna Stock":
             st.warning("KLAR price data not yet available from yfinance. Try refreshing.")
             st.stop()
 
-        current_price = float(klar.iloc[-1])
-        today_ret     = float(ret.iloc[-1]) * 100 if len(ret) > 0 else 0.0
-        ann_vol       = float(ret.std() * np.sqrt(252) * 100) if len(ret) > 1 else 0.0
+        @st.fragment(run_every=live_every)
+        def klar_kpi_row(klar, ret):
+            current_price = float(klar.iloc[-1])
+            today_ret     = float(ret.iloc[-1]) * 100 if len(ret) > 0 else 0.0
+            ann_vol       = float(ret.std() * np.sqrt(252) * 100) if len(ret) > 1 else 0.0
+            change_label  = "today"
+
+            live_px = quotes.latest("KLAR") if quotes else None
+            if live_px is not None:
+                today_ret     = (live_px / current_price - 1) * 100
+                current_price = live_px
+                change_label  = "vs last close"
 
-        c1, c2, c3, c4 = st.columns(4)
-        with c1: st.metric("Current Price", f"${current_price:.2f}", f"{today_ret:+.2f}% today")
-        with c2: st.metric("From IPO ($40)", f"{(current_price/40-1)*100:.1f}%", delta_color="inverse")
-        with c3: st.metric("From ATH ($57.20)", f"{(current_price/57.20-1)*100:.1f}%", delta_color="inverse")
-        with c4: st.metric("Ann. Volatility", f"{ann_vol:.1f}%", "vs S&P ~15%")
+            c1, c2, c3, c4 = st.columns(4)
+            with c1: st.metric("Current Price", f"${current_price:.2f}", f"{today_ret:+.2f}% {change_label}")
+            with c2: st.metric("From IPO ($40)", f"{(current_price/40-1)*100:.1f}%", delta_color="inverse")
+            with c3: st.metric("From ATH ($57.20)", f"{(current_price/57.20-1)*100:.1f}%", delta_color="inverse")
+            with c4: st.metric("Ann. Volatility", f"{ann_vol:.1f}%", "vs S&P ~15%")
+
+        klar_kpi_row(klar, ret)
 
         st.markdown("---")
 
-        # Tabs
-        t1, t2, t3 = st.tabs(["📊  KLAR Price Chart", "📉  Relative Performance", "🎲  Risk Analysis"])
+        # ── Tab fragments ─────────────────────────────────────────────────────
+        # Each tab body is an st.fragment: a widget change inside one tab reruns
+        # only that tab, not the CSS, sidebar, data load or the sibling tabs.
+
+        @st.fragment(run_every=live_every)
+        def klar_price_tab(prices):
+            window = st.radio("Window", PRICE_WINDOWS, index=2, horizontal=True,
+                              key="klar_price_window", label_visibility="collapsed")
+
+            # Reuse this session's figure across live refreshes and only append
+            # new ticks to its trace; rebuild when the window, base data or live mode
+            # changes, so switching live mode off drops the intraday ticks.
+            chart_key = (window, id(prices), quotes is not None)
+            live_chart = st.session_state.get("klar_live_chart")
+            if live_chart is None or live_chart["key"] != chart_key:
+                # Copy the shared cached figure: live ticks are appended to it in place
+                fig = go.Figure(build_klar_price_figure(prices, window))
+                live_chart = {"key": chart_key, "seq": 0, "fig": fig,
+                              "history": len(fig.data[0].x)}
+                st.session_state["klar_live_chart"] = live_chart
+            fig = live_chart["fig"]
+
+            if quotes is not None:
+                new = quotes.since(live_chart["seq"])
+                ticks = [(ts, q["KLAR"]) for _, ts, q in new if "KLAR" in q]
+                if ticks:
+                    # Daily history plus only the most recent LIVE_POINTS ticks
+                    trace, n = fig.data[0], live_chart["history"]
+                    live_x = (tuple(trace.x[n:]) + tuple(ts for ts, _ in ticks))[-LIVE_POINTS:]
+                    live_y = (tuple(trace.y[n:]) + tuple(p for _, p in ticks))[-LIVE_POINTS:]
+                    trace.x = tuple(trace.x[:n]) + live_x
+                    trace.y = tuple(trace.y[:n]) + live_y
+                if new:
+                    # Resume after the last tick read, not quotes.seq: a tick may land in between
+                    live_chart["seq"] = new[-1][0]
 
-        with t1:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=prices.index, y=prices["KLAR"],
-                fill="tozeroy",
-                fillcolor="rgba(232,197,109,0.07)",
-                line=dict(color=GOLD, width=2),
-                name="KLAR",
-                hovertemplate="<b>%{x|%b %d}</b><br>$%{y:.2f}<extra></extra>",
-            ))
-            # Key level lines
-            fig.add_hline(y=40, line_dash="dash", line_color=MUTED, annotation_text="IPO Price $40", annotation_font_size=10)
-            fig.add_hline(y=57.20, line_dash="dot", line_color=GOLD, annotation_text="ATH $57.20", annotation_font_size=10)
-            fig.update_layout(
-                **PLOTLY_TEMPLATE["layout"],
-                height=400, yaxis_title="Price (USD)",
-                title=dict(text="Klarna (KLAR) — Post-IPO Price History", font=dict(color="white", size=13)),
-            )
             st.plotly_chart(fig, use_container_width=True)
 
             st.markdown("""
@@ -389,13 +519,17 @@ elif section == "📈 Klarna Stock":
             </div>
             """, unsafe_allow_html=True)
 
-        with t2:
-            fig = go.Figure()
+        @st.fragment
+        def relative_performance_tab(prices_norm):
             labels = {"KLAR": "Klarna", "AFRM": "Affirm", "PYPL": "PayPal", "SQ": "Block", "^GSPC": "S&P 500"}
             widths = {"KLAR": 2.5, "AFRM": 1.8, "PYPL": 1.8, "SQ": 1.8, "^GSPC": 1.5}
             dashes = {"KLAR": "solid", "AFRM": "dash", "PYPL": "dash", "SQ": "dash", "^GSPC": "dot"}
 
-            for ticker in ["KLAR", "AFRM", "PYPL", "SQ", "^GSPC"]:
+            shown = st.multiselect("Compare", list(labels), default=list(labels),
+                                   format_func=labels.get, key="relperf_tickers")
+
+            fig = go.Figure()
+            for ticker in shown:
                 fig.add_trace(go.Scatter(
                     x=prices_norm.index,
                     y=prices_norm[ticker],
@@ -407,8 +541,9 @@ elif section == "📈 Klarna Stock":
                          annotation_text="IPO baseline", annotation_font_size=9)
             fig.update_layout(
                 **PLOTLY_TEMPLATE["layout"],
-                height=420, yaxis_title="Indexed Price (100 = Sep 10 2025)",
-                title=dict(text="Relative Performance Since Klarna IPO (Sep 10, 2025 = 100)", font=dict(color="white", size=13)),
+                height=420, yaxis_title="Indexed Price (100 = first close since Sep 10 2025)",
+                title=dict(text="Relative Performance Since Klarna IPO (each ticker's first close = 100)",
+                           font=dict(color="white", size=13)),
             )
             st.plotly_chart(fig, use_container_width=True)
 
@@ -422,7 +557,8 @@ elif section == "📈 Klarna Stock":
             </div>
             """, unsafe_allow_html=True)
 
-        with t3:
+        @st.fragment
+        def risk_analysis_tab(returns):
             col1, col2 = st.columns(2)
 
             with col1:
@@ -430,10 +566,11 @@ elif section == "📈 Klarna Stock":
                 if "KLAR" not in returns.columns or len(returns["KLAR"].dropna()) == 0:
                     st.info("KLAR return data not yet available.")
                 else:
+                    nbins = st.slider("Histogram bins", 10, 80, 40, step=5, key="klar_ret_bins")
                     klar_ret = returns["KLAR"].dropna() * 100
                     fig = go.Figure()
                     fig.add_trace(go.Histogram(
-                        x=klar_ret, nbinsx=40,
+                        x=klar_ret, nbinsx=nbins,
                         marker_color=GOLD, opacity=0.7, name="Daily Returns",
                     ))
                     fig.add_vline(x=float(klar_ret.mean()), line_color=RED, line_dash="dash",
@@ -449,28 +586,13 @@ elif section == "📈 Klarna Stock":
 
             with col2:
                 # Risk/return scatter — fully dynamic, no hardcoded lengths
-                TICKER_LABEL_MAP = {
-                    "KLAR": "Klarna", "AFRM": "Affirm",
-                    "PYPL": "PayPal", "SQ": "Block", "^GSPC": "S&P 500"
-                }
                 ALL_COLORS = {**TICKER_COLORS, "^GSPC": MUTED}
 
-                avail = [t for t in ["KLAR","AFRM","PYPL","SQ","^GSPC"]
-                         if t in returns.columns]
-                rows = []
-                for t in avail:
-                    r = returns[t].dropna()
-                    if len(r) > 1:
-                        rows.append({
-                            "ticker":     t,
-                            "ann_return": r.mean() * 252 * 100,
-                            "ann_vol":    r.std()  * np.sqrt(252) * 100,
-                            "label":      TICKER_LABEL_MAP.get(t, t),
-                            "color":      ALL_COLORS.get(t, MUTED),
-                        })
-
-                if rows:
-                    s = pd.DataFrame(rows)
+                s = risk_return(returns) if stored_risk is None else stored_risk.copy()
+                s["label"] = s["ticker"].map(lambda t: TICKER_LABELS.get(t, t))
+                s["color"] = s["ticker"].map(lambda t: ALL_COLORS.get(t, MUTED))
+
+                if len(s):
                     fig = go.Figure()
                     for _, row in s.iterrows():
                         fig.add_trace(go.Scatter(
@@ -496,6 +618,79 @@ elif section == "📈 Klarna Stock":
                     st.info("Not enough data yet for risk/return scatter.")
 
 
+
+        @st.fragment
+        def factor_attribution_tab(returns):
+            if MARKET not in returns.columns or "KLAR" not in returns.columns or returns["KLAR"].count() < MIN_OBS:
+                st.info("Not enough KLAR and market return history yet for a factor decomposition.")
+                return
+
+            window = st.slider("Rolling window (trading days)", FACTOR_WINDOWS[0], FACTOR_WINDOWS[-1], 60,
+                               step=FACTOR_WINDOWS.step, key="factor_window")
+            factors, rolling, full = factor_model(returns, window)
+            cum = attribution(returns, factors, "KLAR", fit=full)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig = go.Figure()
+                for part, color in [("market", MUTED), ("sector", BLUE), ("idiosyncratic", RED)]:
+                    fig.add_trace(go.Scatter(
+                        x=cum.index, y=cum[part], name=part.capitalize(),
+                        stackgroup="parts", line=dict(color=color, width=1),
+                    ))
+                fig.add_trace(go.Scatter(
+                    x=cum.index, y=cum["total"], name="KLAR total",
+                    line=dict(color=GOLD, width=2.5),
+                ))
+                fig.add_hline(y=0, line_color="#2A2A35", line_dash="dot")
+                fig.update_layout(
+                    **PLOTLY_TEMPLATE["layout"], height=360, yaxis_title="Cumulative Return (%)",
+                    title=dict(text="KLAR Return Attribution — Market / Sector / Idiosyncratic",
+                               font=dict(color="white", size=12)),
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+            with col2:
+                fig = go.Figure()
+                for name, color in [("beta_market", MUTED), ("beta_sector", BLUE)]:
+                    fig.add_trace(go.Scatter(
+                        x=rolling[name].index, y=rolling[name]["KLAR"],
+                        name=name.replace("beta_", "β ").title(), line=dict(color=color, width=2),
+                    ))
+                fig.add_trace(go.Scatter(
+                    x=rolling["r2"].index, y=rolling["r2"]["KLAR"], name="R²",
+                    line=dict(color=GOLD, width=1.5, dash="dot"), yaxis="y2",
+                ))
+                fig.update_layout(
+                    **PLOTLY_TEMPLATE["layout"], height=360,
+                    yaxis2=dict(overlaying="y", side="right", range=[0, 1], showgrid=False, title="R²"),
+                    title=dict(text=f"KLAR Rolling {window}-Day Factor Betas", font=dict(color="white", size=12)),
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+            summary = pd.DataFrame({
+                "β market":        full["beta_market"].iloc[-1],
+                "β sector":        full["beta_sector"].iloc[-1],
+                "R²":              full["r2"].iloc[-1],
+                "Resid. vol (%)":  full["resid_vol"].iloc[-1],
+            }).dropna().rename(index=lambda t: TICKER_LABELS.get(t, t))
+            st.dataframe(summary.round(2), use_container_width=True)
+            st.caption("Full-sample fits. Each BNPL peer's sector factor excludes that peer itself.")
+
+        # Tabs
+        t1, t2, t3, t4 = st.tabs(["📊  KLAR Price Chart", "📉  Relative Performance", "🎲  Risk Analysis",
+                                  "🧮  Factor Attribution"])
+
+        with t1:
+            klar_price_tab(prices)
+        with t2:
+            relative_performance_tab(prices_norm)
+        with t3:
+            risk_analysis_tab(returns)
+        with t4:
+            factor_attribution_tab(returns)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # SECTION: FUNDAMENTALS
 # ══════════════════════════════════════════════════════════════════════════════
@@ -732,9 +927,11 @@ elif section == "🏆 Competitors":
             )
 
     st.markdown("---")
-    t1, t2, t3 = st.tabs(["📊  Valuation & Growth", "🔥  Scorecard", "🔗  Correlation"])
 
-    with t1:
+    # ── Tab fragments ─────────────────────────────────────────────────────────
+
+    @st.fragment
+    def valuation_growth_tab(competitors):
         col1, col2, col3 = st.columns(3)
 
         with col1:
@@ -772,7 +969,8 @@ elif section == "🏆 Competitors":
                               title=dict(text="Return Since KLAR IPO", font=dict(color="white", size=12)))
             st.plotly_chart(fig, use_container_width=True)
 
-    with t2:
+    @st.fragment
+    def scorecard_tab():
         scorecard_data = {
             "Metric":           ["Revenue Growth","P/S (lower=better)","Profitability","User Scale","Stock Perf","Reg. Risk","AI Invest","Credit Quality"],
             "KLAR":             [5, 4, 1, 5, 1, 2, 5, 3],
@@ -782,6 +980,10 @@ elif section == "🏆 Competitors":
         }
         sc = pd.DataFrame(scorecard_data)
 
+        metrics = st.multiselect("Metrics", list(sc["Metric"]), default=list(sc["Metric"]),
+                                 key="scorecard_metrics")
+        sc = sc[sc["Metric"].isin(metrics)]
+
         SCORECARD_TICKERS = {"KLAR": GOLD, "AFRM": GREEN, "PYPL": BLUE, "SQ": ORANGE}
         fig = go.Figure()
         for ticker, color in SCORECARD_TICKERS.items():
@@ -794,32 +996,67 @@ elif section == "🏆 Competitors":
         fig.update_yaxes(tickvals=[1,2,3,4,5], ticktext=["Poor","Below Avg","Average","Good","Excellent"])
         st.plotly_chart(fig, use_container_width=True)
 
-        totals = {t: sum(scorecard_data[t]) for t in ["KLAR","AFRM","PYPL","SQ"]}
+        totals = {t: int(sc[t].sum()) for t in SCORECARD_TICKERS}
         cols = st.columns(4)
         for col, (ticker, total) in zip(cols, totals.items()):
             with col:
-                st.metric(f"{ticker} Total", f"{total}/40")
+                st.metric(f"{ticker} Total", f"{total}/{5 * len(sc)}")
+
+    @st.fragment
+    def correlation_tab(returns):
+        label = lambda t: TICKER_LABELS.get(t, t)
+        # Only use columns that actually exist in returns
+        avail_tickers = list(returns.columns)
+        c1, c2, c3 = st.columns([3, 1, 1])
+        with c1:
+            if len(avail_tickers) > HEATMAP_MAX_TICKERS and not st.toggle("Pick tickers", key="corr_pick"):
+                shown = avail_tickers        # whole universe, without a multiselect holding every ticker
+            else:
+                default = avail_tickers[:HEATMAP_MAX_TICKERS]
+                shown = st.multiselect("Tickers", avail_tickers, default=default,
+                                       format_func=label, key="corr_tickers")
+        with c2:
+            method = st.selectbox("Method", ["pearson", "spearman"], key="corr_method")
+        with c3:
+            shrinkage = st.selectbox("Shrinkage", [None, "ledoit-wolf"], key="corr_shrinkage",
+                                     format_func=lambda v: "None" if v is None else "Ledoit-Wolf")
+
+        if len(shown) < 2:
+            st.info("Not enough ticker data for correlation matrix yet. Try refreshing.")
+            return
+
+        if len(shown) > HEATMAP_MAX_TICKERS:
+            # Large universes: nearest neighbours, computed block by block without
+            # ever holding the N x N matrix (or clustering it)
+            st.markdown("**Most correlated peers**")
+            st.dataframe(correlation_neighbours(returns[shown], method, shrinkage),
+                         hide_index=True, use_container_width=True)
+            return
+
+        # Pairwise-complete, reordered so correlated names sit next to each other
+        corr, clusters = correlation_matrix(returns[shown], method, shrinkage)
+
+        tick_labels = [label(t) for t in corr.columns]
+        fig = go.Figure(go.Heatmap(
+            z=corr.values, x=tick_labels, y=tick_labels,
+            colorscale="RdYlGn", zmin=-1, zmax=1,
+            text=corr.round(2).values,
+            texttemplate="%{text}",
+            textfont=dict(color="white", size=12),
+        ))
+        fig.update_layout(**PLOTLY_TEMPLATE["layout"], height=400,
+                          title=dict(text="Returns Correlation Matrix (clustered)", font=dict(color="white", size=13)))
+        st.plotly_chart(fig, use_container_width=True)
 
+    t1, t2, t3 = st.tabs(["📊  Valuation & Growth", "🔥  Scorecard", "🔗  Correlation"])
+
+    with t1:
+        valuation_growth_tab(competitors)
+    with t2:
+        scorecard_tab()
     with t3:
         if live_data_ok:
-            # Only use columns that actually exist in returns
-            avail_tickers = [t for t in ["KLAR","AFRM","PYPL","SQ","^GSPC"] if t in returns.columns]
-            if len(avail_tickers) < 2:
-                st.info("Not enough ticker data for correlation matrix yet. Try refreshing.")
-            else:
-                corr = returns[avail_tickers].corr()
-                labels = {"KLAR":"Klarna","AFRM":"Affirm","PYPL":"PayPal","SQ":"Block","^GSPC":"S&P 500"}
-                tick_labels = [labels[t] for t in corr.columns]
-                fig = go.Figure(go.Heatmap(
-                    z=corr.values, x=tick_labels, y=tick_labels,
-                    colorscale="RdYlGn", zmin=-1, zmax=1,
-                    text=corr.round(2).values,
-                    texttemplate="%{text}",
-                    textfont=dict(color="white", size=12),
-                ))
-                fig.update_layout(**PLOTLY_TEMPLATE["layout"], height=400,
-                                  title=dict(text="Returns Correlation Matrix", font=dict(color="white", size=13)))
-                st.plotly_chart(fig, use_container_width=True)
+            correlation_tab(returns)
         else:
             st.info("Live data needed for correlation matrix.")
 
@@ -880,6 +1117,64 @@ elif section == "📋 Verdict":
         </div>
         """, unsafe_allow_html=True)
 
+    st.markdown("---")
+    st.markdown("## Scenario Valuation")
+
+    @st.fragment
+    def scenario_valuation(kl_annual, valuation):
+        base = base_case(kl_annual, valuation, last_close(prices, "KLAR"))
+
+        c1, c2, c3, c4, c5 = st.columns(5)
+        with c1: growth = st.slider("GMV growth % / yr", -10, 60, DEFAULT_RANGES["growth"], key="val_growth")
+        with c2: take   = st.slider("Exit take rate %", 1.5, 4.0, DEFAULT_RANGES["take_rate"], step=0.1, key="val_take")
+        with c3: margin = st.slider("Exit net margin %", -20, 25, DEFAULT_RANGES["margin"], key="val_margin")
+        with c4: ps     = st.slider("Exit P/S", 0.5, 10.0, DEFAULT_RANGES["ps"], step=0.5, key="val_ps")
+        with c5:
+            horizon  = st.selectbox("Horizon (yrs)", [1, 2, 3, 4, 5], index=2, key="val_horizon")
+            discount = st.number_input("Discount %", 0.0, 30.0, 10.0, step=1.0, key="val_discount")
+
+        grid = scenario_grid(base, *grid_axes(growth, take, margin, ps), horizon=horizon, discount=discount)
+        dist = price_distribution(grid)
+
+        m1, m2, m3, m4 = st.columns(4)
+        with m1: st.metric("Median Implied Price", f"${dist['median']:.2f}",
+                           f"{(dist['median']/base['price']-1)*100:+.0f}% vs ${base['price']:.2f}")
+        with m2: st.metric("P10 – P90", f"${dist['p10']:.0f} – ${dist['p90']:.0f}")
+        with m3: st.metric("Above Current Price", f"{(grid['price'] > base['price']).mean()*100:.0f}%")
+        with m4: st.metric("Scenarios", f"{dist['n']:,}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            hist = dist["hist"]
+            fig = go.Figure(go.Bar(
+                x=(hist["left"] + hist["right"]) / 2, y=hist["count"],
+                width=hist["right"] - hist["left"], marker_color=GOLD, opacity=0.7,
+            ))
+            fig.add_vline(x=base["price"], line_color=RED, line_dash="dash",
+                          annotation_text=f"Current ${base['price']:.2f}", annotation_font_size=10)
+            fig.add_vline(x=43.29, line_color=GREEN, line_dash="dot",
+                          annotation_text="Analyst target $43.29", annotation_font_size=10,
+                          annotation_position="bottom right")
+            fig.update_layout(**PLOTLY_TEMPLATE["layout"], height=340, showlegend=False,
+                              xaxis_title="Implied Share Price ($)", yaxis_title="Scenarios",
+                              title=dict(text="Implied Price Distribution", font=dict(color="white", size=12)))
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col2:
+            surface = sensitivity(grid, "growth", "ps")
+            fig = go.Figure(go.Heatmap(
+                z=surface.values, x=surface.columns, y=surface.index,
+                colorscale="RdYlGn", zmid=base["price"],
+                colorbar=dict(title="$"),
+                hovertemplate="Growth %{x:.1f}%<br>P/S %{y:.1f}x<br>Median $%{z:.2f}<extra></extra>",
+            ))
+            fig.update_layout(**PLOTLY_TEMPLATE["layout"], height=340,
+                              xaxis_title="GMV Growth (% / yr)", yaxis_title="Exit P/S",
+                              title=dict(text="Median Price — Growth × P/S", font=dict(color="white", size=12)))
+            st.plotly_chart(fig, use_container_width=True)
+
+    scenario_valuation(kl_annual, valuation)
+
     st.markdown("---")
     st.markdown("## Social Impact")
 
@@ -910,3 +1205,65 @@ elif section == "📋 Verdict":
 
     st.markdown("---")
     st.caption("Data sources: Klarna SEC F-1, CFPB BNPL Reports Jan/Dec 2025, NY Fed Q1 2025, Morgan Stanley AlphaWise, LendingTree Survey 2025, Richmond Fed EB-25-03, Yahoo Finance. Not financial advice.")
+
+
+# ── Export (a fragment, so changing options doesn't re-run the page) ─────────
+@st.fragment
+def export_panel():
+    dataset = st.selectbox("Dataset", export.DATASETS, key="export_dataset")
+    fmt = st.selectbox("Format", list(export.MIME), key="export_format")
+    tickers = start = end = None
+    if dataset != "scenarios":
+        tickers = st.multiselect("Tickers", TICKERS, default=TICKERS, key="export_tickers")
+        c1, c2 = st.columns(2)
+        start = c1.date_input("From", value=None, key="export_start")
+        end = c2.date_input("To", value=None, key="export_end")
+        if start and end and start > end:
+            st.error("'From' is after 'To'.")
+            return
+
+    # The file is built in this process's memory, so big exports go through the streaming paths
+    size = export.estimate_bytes(dataset, fmt, tickers, start, end)
+    if size > DOWNLOAD_MAX_MB * 2**20:
+        args = [f"python export.py {dataset} -o {dataset}.{fmt}",
+                f"--tickers {','.join(tickers)}" if tickers else "",
+                f"--start {start}" if start else "", f"--end {end}" if end else ""]
+        st.warning(f"About {size / 2**20:,.0f} MB, over the {DOWNLOAD_MAX_MB} MB dashboard limit. Stream it with "
+                   f"`{' '.join(a for a in args if a)}` or `GET /v1/export/{dataset}` on the local API.")
+        return
+
+    def build():
+        # Runs only on click, so nothing is encoded until a download is asked for
+        out = io.BytesIO()
+        export.export(dataset, out, fmt, tickers=tickers, start=start, end=end)
+        out.seek(0)
+        return out
+
+    st.download_button("⬇️ Download", data=build, file_name=f"{dataset}.{fmt}",
+                       mime=export.MIME[fmt], use_container_width=True)
+    st.caption(f"Exported from the stored snapshot, up to {DOWNLOAD_MAX_MB} MB. "
+               "Use `python export.py` or `/v1/export` for larger files.")
+
+
+with st.sidebar.expander("Export data"):
+    export_panel()
+
+# ── Cache stats (rendered last so they include this run) ──────────────────────
+with st.sidebar.expander("Cache"):
+    st.caption(f"{CACHE.memory_bytes / 2**20:.1f} / {CACHE.memory_budget / 2**20:.0f} MB in memory")
+    st.dataframe(CACHE.stats(), use_container_width=True)
+
+    if warmup is not None:
+        status = warmup.status()
+        if status["state"] == "running":
+            st.progress(status["done"] / max(status["total"], 1),
+                        text=f"Warming {status['stage'] or '…'} ({status['reason']}): {status['done']}/{status['total']}")
+        elif status["last_run"] is not None:
+            st.caption(f"Warmed {status['last_run']:%b %d %H:%M} ET in {status['duration']:.1f}s"
+                       + (f" · {status['errors']} errors" if status["errors"] else ""))
+        if status["next_run"] is not None:
+            st.caption(f"Market {'open' if market_is_open() else 'closed'} · next warm-up "
+                       f"{status['next_run']:%b %d %H:%M} ET ({status['next_reason']})")
+        st.dataframe(warmup.jobs(), hide_index=True, use_container_width=True)
+        if st.button("Warm now", disabled=status["state"] == "running"):
+            warmup.trigger()
@@ -0,0 +1,367 @@
+"""Process-wide, memory-budgeted cache for dashboard data.
+
+`st.cache_data` keeps a pickled copy of every distinct argument set with no
+size limit. This cache holds all entries under one byte budget shared by every
+namespace and session. When the budget is exceeded it evicts by
+GreedyDual-Size-Frequency: priority = clock + hits / size, so large, rarely
+used entries go first, and the clock ages out entries that were hot long ago.
+Evicted entries spill to a disk tier with its own budget and are promoted back
+on the next hit.
+
+Cached values are shared between sessions, so callers must treat them as
+read-only.
+"""
+
+import atexit
+import contextlib
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MEMORY_BUDGET = int(os.environ.get("BNPL_CACHE_MB", 512)) * 2**20
+DISK_BUDGET   = int(os.environ.get("BNPL_CACHE_DISK_MB", 2048)) * 2**20
+SPILL_DIR     = Path(os.environ.get("BNPL_CACHE_DIR", Path(tempfile.gettempdir()) / "bnpl-cache"))
+
+
+def sizeof(value):
+    """Approximate in-memory footprint of a cached value in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if value is None or isinstance(value, (int, float, str, bytes, bool)):
+        return sys.getsizeof(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def fingerprint(*parts):
+    """Stable hash of call arguments, hashing pandas/numpy data by content."""
+    h = hashlib.sha1()
+
+    def feed(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            labels = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+            h.update(repr((type(obj).__name__, obj.shape, labels)).encode())
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            h.update(repr((obj.dtype, obj.shape)).encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, (tuple, list)):
+            h.update(b"(")
+            for o in obj:
+                feed(o)
+            h.update(b")")
+        elif isinstance(obj, dict):
+            feed(sorted(obj.items(), key=lambda kv: repr(kv[0])))
+        else:
+            h.update(repr(obj).encode())
+
+    feed(parts)
+    return h.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("value", "size", "hits", "priority", "expires")
+
+    def __init__(self, value, size, expires):
+        self.value = value
+        self.size = max(size, 1)
+        self.hits = 1
+        self.priority = 0.0
+        self.expires = expires
+
+
+class BudgetCache:
+    """Byte-budgeted in-memory cache with a spill-to-disk tier.
+
+    The lock only guards the index. Sizing values and reading or writing
+    spill files happen outside it, so memory hits never wait on disk I/O.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET, spill_dir=SPILL_DIR):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.spill_dir = Path(spill_dir)
+        self._entries = {}                 # (namespace, key) -> _Entry
+        self._spilling = {}                # (namespace, key) -> _Entry evicted, being written to disk
+        self._disk = {}                    # (namespace, key) -> (path, size, expires)
+        self._clock = 0.0
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._spill_seq = itertools.count()
+        self._lock = threading.RLock()
+        self._inflight = {}                # (namespace, key) -> [lock, waiters]
+        self._stats = defaultdict(lambda: defaultdict(int))
+
+    # ── Lookup ────────────────────────────────────────────────────────────────
+
+    def get(self, namespace, key, default=None):
+        now = time.time()
+        with self._lock:
+            stats = self._stats[namespace]
+            entry = self._entries.get((namespace, key)) or self._spilling.get((namespace, key))
+            if entry is not None and entry.expires >= now:
+                entry.hits += 1
+                entry.priority = self._clock + entry.hits / entry.size
+                stats["hits"] += 1
+                return entry.value
+            stale = self._drop(namespace, key) if entry is not None else []
+            spilled = self._disk.get((namespace, key))
+            if spilled is not None and spilled[2] < now:
+                stale += self._drop_spilled(namespace, key)
+                spilled = None
+            if spilled is None:
+                stats["misses"] += 1
+        _unlink(stale)
+        if spilled is None:
+            return default
+
+        value = _load(spilled[0])
+        with self._lock:
+            if value is _MISSING:
+                stale = self._drop_spilled(namespace, key) if self._disk.get((namespace, key)) is spilled else []
+                stats["misses"] += 1
+            else:
+                stale = []
+                stats["disk_hits"] += 1
+        _unlink(stale)
+        if value is _MISSING:
+            return default
+        self._admit(namespace, key, value, spilled[2], promote=spilled)
+        return value
+
+    def put(self, namespace, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else float("inf")
+        self._admit(namespace, key, value, expires)
+
+    @contextlib.contextmanager
+    def computing(self, namespace, key):
+        """Hold the per-key lock while a missing value is computed.
+
+        Every caller asking for the same (namespace, key) queues on one lock,
+        whichever wrapper or thread it comes from. Yields True if another
+        caller held it first, i.e. the value may now be cached.
+        """
+        with self._lock:
+            slot = self._inflight.setdefault((namespace, key), [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            waited = not slot[0].acquire(blocking=False)
+            if waited:
+                slot[0].acquire()
+            try:
+                yield waited
+            finally:
+                slot[0].release()
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._inflight[(namespace, key)]
+
+    def clear(self, namespace=None):
+        with self._lock:
+            stale = []
+            for ns, key in [k for k in {**self._entries, **self._spilling} if namespace in (None, k[0])]:
+                stale += self._drop(ns, key)
+            for ns, key in [k for k in self._disk if namespace in (None, k[0])]:
+                stale += self._drop_spilled(ns, key)
+        _unlink(stale)
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+
+    def stats(self):
+        """One row per namespace: hit counts, evictions and resident bytes."""
+        with self._lock:
+            rows = {}
+            for ns in set(self._stats) | {k[0] for k in self._entries} | {k[0] for k in self._disk}:
+                s = self._stats[ns]
+                rows[ns] = {
+                    "entries":    sum(1 for k in self._entries if k[0] == ns),
+                    "mem_mb":     sum(e.size for k, e in self._entries.items() if k[0] == ns) / 2**20,
+                    "spilled":    sum(1 for k in self._disk if k[0] == ns),
+                    "disk_mb":    sum(d[1] for k, d in self._disk.items() if k[0] == ns) / 2**20,
+                    "hits":       s["hits"],
+                    "disk_hits":  s["disk_hits"],
+                    "misses":     s["misses"],
+                    "evictions":  s["evictions"],
+                }
+            return pd.DataFrame.from_dict(rows, orient="index").sort_index()
+
+    @property
+    def memory_bytes(self):
+        return self._bytes
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+    # Methods that touch the index run under the lock and return the spill
+    # files that became garbage; callers unlink them after releasing it.
+
+    def _admit(self, namespace, key, value, expires, promote=None):
+        entry = _Entry(value, sizeof(value), expires)       # sizeof may pickle: keep it outside the lock
+        to_spill = []
+        with self._lock:
+            if promote is not None and ((namespace, key) in self._entries
+                                        or self._disk.get((namespace, key)) is not promote):
+                return                     # a newer value landed while the spill was being read
+            if promote is not None and entry.size > self.memory_budget:
+                return                     # too big for memory: it stays on disk
+            stale = self._drop(namespace, key)
+            entry.priority = self._clock + entry.hits / entry.size
+            if entry.size > self.memory_budget:
+                # Too big to ever live in memory: keep it on disk only
+                self._stats[namespace]["evictions"] += 1
+                self._spilling[(namespace, key)] = entry
+                to_spill.append(((namespace, key), entry))
+            else:
+                self._entries[(namespace, key)] = entry
+                self._bytes += entry.size
+                while self._bytes > self.memory_budget:
+                    victim = self._evict_one()
+                    if victim is not None:
+                        to_spill.append(victim)
+        _unlink(stale)
+        for (ns, k), evicted in to_spill:
+            self._spill(ns, k, evicted)
+
+    def _evict_one(self):
+        victim = min(self._entries, key=lambda k: self._entries[k].priority)
+        entry = self._entries.pop(victim)
+        self._bytes -= entry.size
+        self._clock = entry.priority
+        self._stats[victim[0]]["evictions"] += 1
+        if entry.expires > time.time():
+            # Still served from memory until its spill file is written
+            self._spilling[victim] = entry
+            return victim, entry
+        return None
+
+    def _drop(self, namespace, key):
+        entry = self._entries.pop((namespace, key), None)
+        if entry is not None:
+            self._bytes -= entry.size
+        self._spilling.pop((namespace, key), None)
+        return self._drop_spilled(namespace, key)
+
+    def _spill(self, namespace, key, entry):
+        """Write an evicted entry to disk (no lock held), then index it."""
+        path = size = None
+        if entry.size <= self.disk_budget:     # larger would flush the whole disk tier and still not fit
+            path = self.spill_dir / namespace / f"{key}.{next(self._spill_seq)}.pkl"
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "wb") as f:
+                    pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = path.stat().st_size
+            except Exception:
+                size = None
+            if size is None or size > self.disk_budget:
+                _unlink([path])
+                path = None
+        with self._lock:
+            if self._spilling.get((namespace, key)) is not entry:
+                stale = [path] if path else []          # re-put or dropped while writing
+            else:
+                del self._spilling[(namespace, key)]
+                stale = self._drop_spilled(namespace, key)
+                if path is not None:
+                    self._disk[(namespace, key)] = (path, size, entry.expires)
+                    self._disk_bytes += size
+                    while self._disk_bytes > self.disk_budget and self._disk:
+                        # Disk tier is plain FIFO: the oldest spill goes first
+                        stale += self._drop_spilled(*next(iter(self._disk)))
+        _unlink(stale)
+
+    def _drop_spilled(self, namespace, key):
+        spilled = self._disk.pop((namespace, key), None)
+        if spilled is None:
+            return []
+        self._disk_bytes -= spilled[1]
+        return [spilled[0]]
+
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return _MISSING
+
+
+def _unlink(paths):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+# Spill files are only indexed in memory, so each process gets its own directory
+CACHE = BudgetCache(spill_dir=SPILL_DIR / str(os.getpid()))
+atexit.register(shutil.rmtree, CACHE.spill_dir, ignore_errors=True)
+
+
+def cached(namespace, ttl=None, cache=None):
+    """Memoise a function in the shared budgeted cache under `namespace`.
+
+    Arguments are fingerprinted by content, so DataFrames are valid keys.
+    None (or all-None tuple) results signal a failed fetch and are not cached.
+    Concurrent misses on the same key compute it once.
+    `func.refresh(*args)` recomputes and overwrites the entry in place, so
+    readers keep getting the old value until the new one is stored.
+    """
+    def decorator(func):
+        def store_result(key, args, kwargs):
+            value = func(*args, **kwargs)
+            if not _is_empty(value):
+                (cache or CACHE).put(namespace, key, value, ttl=ttl)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = fingerprint(func.__module__, func.__qualname__, args, kwargs)
+            value = (cache or CACHE).get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                return value
+            # The lock lives in the cache, so re-created wrappers (every Streamlit rerun) share it
+            with (cache or CACHE).computing(namespace, key) as waited:
+                if waited:
+                    value = (cache or CACHE).get(namespace, key, _MISSING)
+                if value is _MISSING:
+                    value = store_result(key, args, kwargs)
+            return value
+
+        def refresh(*args, **kwargs):
+            """Recompute and replace the cached value, however fresh it is."""
+            key = fingerprint(func.__module__, func.__qualname__, args, kwargs)
+            # Misses on the same key during a refresh wait for it instead of computing again
+            with (cache or CACHE).computing(namespace, key):
+                return store_result(key, args, kwargs)
+
+        wrapper.clear = lambda: (cache or CACHE).clear(namespace)
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
+
+
+_MISSING = object()
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, tuple) and all(v is None for v in value))
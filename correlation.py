@@ -0,0 +1,187 @@
+"""Correlation for ticker universes too large for a dense annotated heatmap.
+
+Correlations are pairwise-complete (each pair uses only the days both tickers
+traded), computed in column blocks so peak memory is O(T x block) rather than
+O(T x N) per intermediate. Callers that only need each ticker's nearest
+neighbours never materialise the full N x N matrix.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+BLOCK       = 256   # tickers per block
+MIN_PERIODS = 20    # overlapping observations required for a correlation
+
+
+def _prepare(returns, method):
+    if method == "spearman":
+        # Ranks over each ticker's own history; an approximation of the
+        # pairwise-complete Spearman, which would re-rank every overlap.
+        returns = returns.rank()
+    elif method != "pearson":
+        raise ValueError(f"unsupported method {method!r}")
+    mask = returns.notna().to_numpy(dtype=np.float64)
+    values = np.nan_to_num(returns.to_numpy(dtype=np.float64))
+    return values, mask
+
+
+def _corr_block(values, mask, rows, cols, min_periods):
+    """Pairwise-complete correlation of column block `rows` against `cols`."""
+    x, mx = values[:, rows], mask[:, rows]
+    y, my = values[:, cols], mask[:, cols]
+    n   = mx.T @ my
+    sx  = x.T @ my
+    sy  = mx.T @ y
+    sxx = (x * x).T @ my
+    syy = mx.T @ (y * y)
+    sxy = x.T @ y
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov   = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        corr  = cov / np.sqrt(var_x * var_y)
+    corr[n < min_periods] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _iter_row_blocks(values, mask, block, min_periods):
+    n = values.shape[1]
+    everything = slice(0, n)
+    for start in range(0, n, block):
+        rows = slice(start, min(start + block, n))
+        yield rows, _corr_block(values, mask, rows, everything, min_periods)
+
+
+def pairwise_corr(returns, method="pearson", block=BLOCK, min_periods=MIN_PERIODS):
+    """Full pairwise-complete correlation matrix, computed block by block."""
+    values, mask = _prepare(returns, method)
+    out = np.empty((values.shape[1],) * 2)
+    for rows, corr in _iter_row_blocks(values, mask, block, min_periods):
+        out[rows] = corr
+    np.fill_diagonal(out, 1.0)
+    return pd.DataFrame(out, index=returns.columns, columns=returns.columns)
+
+
+def top_k_neighbours(returns, k=5, method="pearson", shrinkage=None, block=BLOCK, min_periods=MIN_PERIODS):
+    """The `k` most correlated peers of every ticker, without the full matrix.
+
+    `shrinkage` is applied as in `clustered_correlation`. Shrinking towards
+    the identity scales every off-diagonal entry by the same factor, so it
+    changes the reported correlations but not who the neighbours are.
+    """
+    scale = 1.0 - intensity(returns, shrinkage, block)
+    values, mask = _prepare(returns, method)
+    tickers = np.asarray(returns.columns)
+    k = min(k, len(tickers) - 1)
+    rows_out = []
+    if k <= 0:
+        return pd.DataFrame(rows_out, columns=["ticker", "neighbour", "corr"])
+    for rows, corr in _iter_row_blocks(values, mask, block, min_periods):
+        idx = np.arange(rows.start, rows.stop)
+        corr[np.arange(len(idx)), idx] = np.nan             # exclude self
+        corr = np.where(np.isnan(corr), -np.inf, corr)
+        top = np.argpartition(-corr, k - 1, axis=1)[:, :k]
+        for i, row_top in enumerate(top):
+            for j in row_top[np.argsort(-corr[i, row_top])]:
+                if np.isfinite(corr[i, j]):
+                    rows_out.append((tickers[idx[i]], tickers[j], corr[i, j] * scale))
+    return pd.DataFrame(rows_out, columns=["ticker", "neighbour", "corr"])
+
+
+# ── Shrinkage ─────────────────────────────────────────────────────────────────
+
+def ledoit_wolf_intensity(returns, block=BLOCK):
+    """Ledoit-Wolf shrinkage intensity towards the identity for a correlation matrix.
+
+    Uses standardised returns with missing days set to zero, which keeps the
+    estimate O(T x N) on ragged histories. The sample matrix S is only ever
+    seen one row block at a time: the estimate needs just trace(S) and the
+    sum of its squared entries.
+    """
+    z = (returns - returns.mean()) / returns.std()
+    x = np.nan_to_num(z.to_numpy(dtype=np.float64))
+    t, n = x.shape
+    trace = sum_sq = 0.0
+    for start in range(0, n, block):
+        s_rows = x[:, start:start + block].T @ x / t
+        trace += np.trace(s_rows, offset=start)
+        sum_sq += np.sum(s_rows * s_rows)
+    mu = trace / n
+    delta = (sum_sq - 2 * mu * trace + mu * mu * n) / n            # ||S - mu I||^2 / n
+    beta = (np.sum(np.sum(x * x, axis=1) ** 2) - t * sum_sq) / (t * t * n)
+    return float(np.clip(beta / delta, 0.0, 1.0)) if delta > 0 else 1.0
+
+
+def intensity(returns, shrinkage, block=BLOCK):
+    """Shrinkage intensity for None, a fixed value in [0, 1] or "ledoit-wolf"."""
+    if shrinkage == "ledoit-wolf":
+        return ledoit_wolf_intensity(returns, block)
+    value = float(shrinkage) if shrinkage else 0.0
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"shrinkage intensity must be in [0, 1], got {shrinkage!r}")
+    return value
+
+
+def shrink(corr, intensity):
+    """Blend `corr` towards the identity; pairs with no overlapping data stay NaN."""
+    c = corr.to_numpy()
+    shrunk = (1 - intensity) * c + intensity * np.eye(len(c))
+    return pd.DataFrame(shrunk, index=corr.index, columns=corr.columns)
+
+
+# ── Clustering ────────────────────────────────────────────────────────────────
+
+def cluster_order(corr, n_clusters=None):
+    """Leaf order and cluster labels from average-linkage on sqrt((1 - rho) / 2).
+
+    Tickers with no correlation to any other (no overlapping history) are not
+    clustered: they go last with label 0.
+    """
+    if n_clusters is not None and n_clusters < 1:
+        raise ValueError(f"n_clusters must be at least 1, got {n_clusters!r}")
+    off_diag = corr.to_numpy(copy=True)
+    np.fill_diagonal(off_diag, np.nan)
+    has_data = ~np.isnan(off_diag).all(axis=1)
+    linked, orphans = corr.columns[has_data], list(corr.columns[~has_data])
+    unclustered = pd.Series(0, index=orphans, dtype=int)
+    c = np.nan_to_num(corr.loc[linked, linked].to_numpy(), nan=0.0)
+    if len(c) < 3:
+        return list(linked) + orphans, pd.concat([pd.Series(1, index=linked), unclustered])
+    dist = np.sqrt(np.clip((1 - c) / 2, 0.0, 1.0))
+    np.fill_diagonal(dist, 0.0)
+    z = linkage(squareform(dist, checks=False), method="average")
+    n_clusters = n_clusters or max(2, int(np.sqrt(len(c))))
+    labels = pd.Series(fcluster(z, n_clusters, criterion="maxclust"), index=linked)
+    return list(linked[leaves_list(z)]) + orphans, pd.concat([labels, unclustered])
+
+
+def cluster_summary(corr, labels):
+    """One row per cluster: size, mean within-cluster correlation, medoid ticker."""
+    rows = []
+    for cluster, members in labels[labels > 0].groupby(labels).groups.items():
+        sub = np.nan_to_num(corr.loc[members, members].to_numpy(), nan=0.0)
+        np.fill_diagonal(sub, np.nan)
+        mean_to_others = np.nanmean(sub, axis=1) if len(sub) > 1 else np.ones(1)
+        rows.append({
+            "cluster":   int(cluster),
+            "size":      len(members),
+            "mean_corr": float(np.nanmean(sub)) if len(sub) > 1 else 1.0,
+            "medoid":    members[int(np.argmax(mean_to_others))],
+            "members":   ", ".join(members),
+        })
+    return pd.DataFrame(rows).sort_values("size", ascending=False, ignore_index=True)
+
+
+def clustered_correlation(returns, method="pearson", shrinkage=None, n_clusters=None):
+    """Pairwise correlation, optionally shrunk, reordered by hierarchical clustering.
+
+    `shrinkage` is None, a fixed intensity in [0, 1], or "ledoit-wolf".
+    Returns the reordered matrix and the cluster label of every ticker.
+    """
+    corr = pairwise_corr(returns, method=method)
+    if shrinkage:
+        corr = shrink(corr, intensity(returns, shrinkage))
+    order, labels = cluster_order(corr, n_clusters)
+    return corr.loc[order, order], labels[order]
@@ -0,0 +1,257 @@
+"""Chunked export of prices, returns, rolling metrics and scenario outputs.
+
+    python export.py prices  -o prices.parquet --tickers KLAR,AFRM --start 2025-10-01
+    python export.py returns -o returns.arrow
+    python export.py rolling -o rolling.csv --window 20
+    python export.py scenarios -o scenarios.parquet
+
+Data is read from the stored price snapshot in chunks, with the ticker filter
+applied as a column projection and the date filter applied per chunk, so no
+full in-memory copy of the panel is ever built. Each chunk is written straight
+to a Parquet, Arrow IPC or CSV writer. The format follows the output suffix
+unless --format is given.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from analytics import DATA_DIR, get_static_data, load_price_panel
+from panel import RENAMES, clean, last_close, stitch
+
+PRICES_CSV = DATA_DIR / "raw" / "stock_prices_raw.csv"
+CHUNK_ROWS = 50_000
+FORMATS    = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".csv": "csv"}
+MIME       = {"parquet": "application/vnd.apache.parquet",
+              "arrow":   "application/vnd.apache.arrow.file",
+              "csv":     "text/csv"}
+DATASETS   = ("prices", "returns", "rolling", "scenarios")
+CELL_BYTES = {"csv": 24}   # per value when estimating an export's size; 8 for binary formats
+
+
+# ── Chunk sources ─────────────────────────────────────────────────────────────
+
+def iter_prices(tickers=None, start=None, end=None, chunksize=CHUNK_ROWS, path=PRICES_CSV, lookback=0):
+    """Price panel in row chunks, reading only the requested columns and dates.
+
+    With `start`, rows before it are skipped unparsed (only the date column is
+    scanned), except for `lookback` sessions before `start` that callers need to
+    seed returns or rolling windows. Chunks are cleaned exactly as the
+    dashboard's panel is (`panel.clean`). The raw rows of each chunk's last
+    session are held back until the next chunk is read, so a session
+    duplicated across a chunk boundary still resolves to its later row.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    date_col = header[0]
+    canonical = list(stitch(pd.DataFrame(columns=header[1:])).columns)
+    wanted = canonical if tickers is None else [t for t in tickers if t in canonical]
+    # Pull in the pre-rename symbols a requested ticker is stitched from
+    sources = {s for t in wanted for s, _ in RENAMES.get(t, [(t, None)]) if s in header}
+    usecols = [date_col] + [c for c in header[1:] if c in sources]
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) if end else None
+    skip = 0
+    if start is not None:
+        dates = pd.to_datetime(pd.read_csv(path, usecols=[date_col])[date_col])   # file is date-ordered
+        sessions = dates.drop_duplicates()
+        first = int(sessions.searchsorted(start)) - lookback
+        if first < len(sessions):
+            start = sessions.iloc[max(first, 0)]
+        skip = int(dates.searchsorted(start))
+
+    emitted, pending = False, None
+    for chunk in pd.read_csv(path, usecols=usecols, index_col=date_col, parse_dates=True,
+                             chunksize=chunksize, skiprows=range(1, skip + 1)):
+        # An all-skipped read comes back untyped
+        chunk = chunk.astype(np.float64).set_axis(pd.to_datetime(chunk.index))
+        if start is not None:
+            chunk = chunk[chunk.index >= start]
+        if end is not None:
+            past_end = chunk.index > end
+            chunk = chunk[~past_end]
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        last = chunk.index == chunk.index.max() if len(chunk) else np.zeros(0, dtype=bool)
+        pending, chunk = chunk[last], clean(chunk[~last]).reindex(columns=wanted)
+        if len(chunk):
+            emitted = True
+            yield chunk.rename_axis("date")
+        if end is not None and past_end.any():
+            break          # file is date-ordered: nothing later can match
+    final = clean(pending).reindex(columns=wanted)
+    if len(final) or not emitted:
+        yield final.rename_axis("date")
+
+
+def iter_returns(tickers=None, start=None, end=None, chunksize=CHUNK_ROWS, path=PRICES_CSV):
+    """Daily returns; the last price of each chunk carries into the next.
+
+    The session before `start` is read too, so the first return is the one on
+    `start` rather than on the session after it.
+    """
+    return _trim_start(_returns(tickers, start, end, chunksize, path), start)
+
+
+def _returns(tickers, start, end, chunksize, path, lookback=0):
+    """Returns from `lookback` sessions before `start` on (untrimmed)."""
+    carry = None
+    for chunk in iter_prices(tickers, start, end, chunksize, path, lookback=lookback + 1):
+        joined = chunk if carry is None else pd.concat([carry, chunk])
+        rets = joined.pct_change(fill_method=None).iloc[len(joined) - len(chunk):]
+        if carry is None:
+            rets = rets.iloc[1:]
+        if len(chunk):
+            carry = chunk.iloc[[-1]]
+        yield rets
+
+
+def iter_rolling(tickers=None, start=None, end=None, window=20, chunksize=CHUNK_ROWS, path=PRICES_CSV):
+    """Rolling annualised return and volatility (%), long format per ticker.
+
+    The `window` sessions before `start` are read back to fill the first
+    windows, so values start on `start`. A full-file read gives the same values
+    unless some of those sessions have no price for any requested ticker.
+    """
+    def rolling():
+        tail = None
+        for rets in _returns(tickers, start, end, chunksize, path, lookback=window - 1):
+            joined = rets if tail is None else pd.concat([tail, rets])
+            roll = joined.rolling(window, min_periods=window)
+            metrics = pd.concat({
+                "ann_return": roll.mean() * 252 * 100,
+                "ann_vol":    roll.std() * np.sqrt(252) * 100,
+            }, axis=1).iloc[len(joined) - len(rets):]
+            tail = joined.iloc[-(window - 1):] if window > 1 else joined.iloc[:0]
+            long = metrics.stack(level=1, future_stack=True).rename_axis(["date", "ticker"]).reset_index()
+            yield long.dropna(subset=["ann_return", "ann_vol"], how="all").set_index("date")
+
+    return _trim_start(rolling(), start)
+
+
+def _trim_start(chunks, start):
+    """Drop rows before `start`, skipping emptied chunks but always yielding at least one."""
+    start = pd.Timestamp(start) if start else None
+    emitted = False
+    for chunk in chunks:
+        if start is not None:
+            chunk = chunk[chunk.index >= start]
+        if len(chunk) or not emitted:
+            emitted = True
+            yield chunk
+
+
+def iter_scenarios(ranges=None, horizon=3, discount=10.0):
+    """Valuation grid in long format, one growth slice per chunk, priced off the stored KLAR close."""
+    from valuation import DEFAULT_RANGES, base_case, grid_axes, scenario_grid
+
+    klarna_annual, _, valuation = get_static_data()[:3]
+    base = base_case(klarna_annual, valuation, last_close(load_price_panel().prices, "KLAR"))
+    axes = grid_axes(**(ranges or DEFAULT_RANGES))
+    grid = scenario_grid(base, *axes, horizon=horizon, discount=discount)
+    _, t, m, p = np.meshgrid([0], axes[1], axes[2], axes[3], indexing="ij")
+    for i, g in enumerate(axes[0]):
+        yield pd.DataFrame({
+            "growth":    np.full(t.size, g),
+            "take_rate": t.ravel(),
+            "margin":    m.ravel(),
+            "ps":        p.ravel(),
+            "price":     grid["price"][i].ravel(),
+        })
+
+
+def iter_dataset(dataset, tickers=None, start=None, end=None, window=20):
+    if dataset == "prices":
+        return iter_prices(tickers, start, end)
+    if dataset == "returns":
+        return iter_returns(tickers, start, end)
+    if dataset == "rolling":
+        return iter_rolling(tickers, start, end, window=window)
+    if dataset == "scenarios":
+        return iter_scenarios()
+    raise ValueError(f"unknown dataset {dataset!r}")
+
+
+def estimate_bytes(dataset, fmt, tickers=None, start=None, end=None, path=PRICES_CSV):
+    """Rough uncompressed size of an export, from the date column alone."""
+    if dataset == "scenarios":
+        from valuation import GRID_SHAPE
+        cells = int(np.prod(GRID_SHAPE)) * 5
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        dates = pd.to_datetime(pd.read_csv(path, usecols=[header[0]])[header[0]]).drop_duplicates()
+        if start:
+            dates = dates[dates >= pd.Timestamp(start)]
+        if end:
+            dates = dates[dates <= pd.Timestamp(end)]
+        n_tickers = len(tickers) if tickers is not None else len(stitch(pd.DataFrame(columns=header[1:])).columns)
+        cells = len(dates) * (n_tickers * 4 if dataset == "rolling" else n_tickers + 1)
+    return cells * CELL_BYTES.get(fmt, 8)
+
+
+# ── Writers ───────────────────────────────────────────────────────────────────
+
+def write_chunks(chunks, sink, fmt):
+    """Write DataFrame chunks to `sink` (path or binary file) as they arrive.
+
+    Returns the number of rows written.
+    """
+    writer, schema, rows = None, None, 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk.reset_index() if chunk.index.name else chunk,
+                                         preserve_index=False)
+            if writer is None:
+                # Daily data: write dates as dates rather than midnight timestamps
+                schema = pa.schema([pa.field(f.name, pa.date32()) if pa.types.is_timestamp(f.type) else f
+                                    for f in table.schema])
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(sink, schema)
+                elif fmt == "arrow":
+                    writer = pa.ipc.new_file(sink, schema)
+                elif fmt == "csv":
+                    writer = pacsv.CSVWriter(sink, schema)
+                else:
+                    raise ValueError(f"unknown format {fmt!r}")
+            writer.write_table(table.cast(schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export(dataset, sink, fmt, **filters):
+    return write_chunks(iter_dataset(dataset, **filters), sink, fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export BNPL dashboard data in chunks.")
+    parser.add_argument("dataset", choices=DATASETS)
+    parser.add_argument("-o", "--output", required=True, help="output path, or - for stdout")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--tickers", help="comma-separated, default all")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--window", type=int, default=20, help="rolling window (rolling only)")
+    args = parser.parse_args(argv)
+
+    if args.window < 1:
+        parser.error("--window must be at least 1")
+    if args.start and args.end and pd.Timestamp(args.start) > pd.Timestamp(args.end):
+        parser.error("--start is after --end")
+    fmt = args.format or FORMATS.get("." + args.output.rsplit(".", 1)[-1].lower())
+    if fmt is None:
+        parser.error("cannot infer --format from the output name")
+    tickers = args.tickers.split(",") if args.tickers else None
+    sink = sys.stdout.buffer if args.output == "-" else args.output
+    rows = export(args.dataset, sink, fmt, tickers=tickers, start=args.start, end=args.end, window=args.window)
+    print(f"wrote {rows:,} rows of {args.dataset} as {fmt}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Market / sector / idiosyncratic factor decomposition.
+
+Every ticker x rolling window regression is solved at once: cumulative sums of
+the masked cross-products give each window's normal equations X'X and X'y as
+differences of two rows, and one batched `np.linalg.solve` handles them all.
+Cost is O(T x N x k^2) regardless of window length, with no Python loop over
+tickers or windows. Sector members are regressed on a leave-one-out sector
+factor, so a peer never explains part of its own return.
+"""
+
+import numpy as np
+import pandas as pd
+
+MARKET  = "^GSPC"
+SECTOR  = ("AFRM", "PYPL", "SQ")
+MIN_OBS = 20   # observations required in a window before it gets a fit
+
+
+def factor_returns(returns, market=MARKET, sector=SECTOR, exclude=None):
+    """Market and sector factors, with the sector made orthogonal to the market.
+
+    The sector factor is the equal-weighted mean of the available peers minus
+    its market beta times the market, so the two contributions don't overlap.
+    `exclude` leaves one peer out of the sector basket.
+    """
+    mkt = returns[market]
+    sec = returns[[t for t in sector if t in returns.columns and t != exclude]].mean(axis=1)
+    both = pd.concat([mkt, sec], axis=1).dropna()
+    beta = both.cov().iloc[0, 1] / both.iloc[:, 0].var() if len(both) > 1 else 0.0
+    return pd.DataFrame({"market": mkt, "sector": sec - beta * mkt})
+
+
+def _window_sums(cum, window):
+    """Rolling-window sums from a cumulative array along axis 0."""
+    out = cum.copy()
+    out[window:] -= cum[:-window]
+    return out
+
+
+def rolling_ols(returns, factors, window=None, min_obs=MIN_OBS):
+    """Batched OLS of every column of `returns` on `factors` plus an intercept.
+
+    `window=None` fits the full sample (one window ending on the last day).
+    Returns a dict of DataFrames indexed by window end date with one column
+    per ticker: "alpha", "beta_<factor>" for each factor, "r2", "resid_vol"
+    (annualised, %) and "n_obs".
+    """
+    factors = factors.reindex(returns.index)
+    y = returns.to_numpy(dtype=np.float64)                               # (T, N)
+    f = factors.to_numpy(dtype=np.float64)                               # (T, F)
+    x = np.column_stack([np.ones(len(f)), f])                            # (T, k)
+    k = x.shape[1]
+
+    # Observation mask: ticker and every factor present on that day
+    m = (~np.isnan(y) & ~np.isnan(x).any(axis=1)[:, None]).astype(np.float64)
+    x = np.nan_to_num(x)
+    y = np.nan_to_num(y) * m
+
+    xx = x[:, :, None] * x[:, None, :]                                   # (T, k, k)
+    cum_n   = np.cumsum(m, axis=0)                                       # (T, N)
+    cum_xx  = np.cumsum(m[:, :, None, None] * xx[:, None], axis=0)       # (T, N, k, k)
+    cum_xy  = np.cumsum(x[:, None, :] * y[:, :, None], axis=0)           # (T, N, k)
+    cum_yy  = np.cumsum(y * y, axis=0)                                   # (T, N)
+
+    if window is None:
+        ends = np.array([len(y) - 1])
+        n, sxx, sxy, syy = cum_n[ends], cum_xx[ends], cum_xy[ends], cum_yy[ends]
+    else:
+        ends = np.arange(window - 1, len(y))
+        n   = _window_sums(cum_n, window)[ends]
+        sxx = _window_sums(cum_xx, window)[ends]
+        sxy = _window_sums(cum_xy, window)[ends]
+        syy = _window_sums(cum_yy, window)[ends]
+
+    valid = n >= max(min_obs, k + 1)
+    sxx = np.where(valid[..., None, None], sxx, np.eye(k))
+    try:
+        beta = np.linalg.solve(sxx, sxy[..., None])[..., 0]              # (W, N, k)
+    except np.linalg.LinAlgError:
+        beta = (np.linalg.pinv(sxx) @ sxy[..., None])[..., 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ssr = np.maximum(syy - np.sum(beta * sxy, axis=-1), 0.0)
+        sst = syy - sxy[..., 0] ** 2 / n
+        r2 = 1 - ssr / sst
+        resid_vol = np.sqrt(ssr / (n - k) * 252) * 100
+
+    index = returns.index[ends]
+    frame = lambda a: pd.DataFrame(np.where(valid, a, np.nan), index=index, columns=returns.columns)
+    out = {"alpha": frame(beta[..., 0])}
+    for i, name in enumerate(factors.columns, start=1):
+        out[f"beta_{name}"] = frame(beta[..., i])
+    out["r2"] = frame(r2)
+    out["resid_vol"] = frame(resid_vol)
+    out["n_obs"] = pd.DataFrame(n, index=index, columns=returns.columns)
+    return out
+
+
+def factor_fits(returns, window=None, market=MARKET, sector=SECTOR, min_obs=MIN_OBS):
+    """`rolling_ols` of every non-market ticker on its market and sector factors.
+
+    Non-members share one batched fit on the full sector factor; each sector
+    member gets its own fit against the factor built from the other peers.
+    Without a market column, or without any stock to fit, every frame is empty.
+    """
+    stocks = returns.drop(columns=[market], errors="ignore")
+    if market not in returns.columns or stocks.columns.empty:
+        empty = pd.DataFrame(index=returns.index[:0], columns=stocks.columns, dtype=np.float64)
+        keys = ["alpha", "beta_market", "beta_sector", "r2", "resid_vol", "n_obs"]
+        return {key: empty.copy() for key in keys}
+    members = [t for t in stocks.columns if t in sector]
+    others = stocks.drop(columns=members)
+    fits = []
+    if len(others.columns):
+        fits.append(rolling_ols(others, factor_returns(returns, market, sector), window, min_obs))
+    for t in members:
+        fits.append(rolling_ols(stocks[[t]], factor_returns(returns, market, sector, exclude=t), window, min_obs))
+    return {key: pd.concat([fit[key] for fit in fits], axis=1)[stocks.columns] for key in fits[0]}
+
+
+def attribution(returns, factors, ticker, fit=None):
+    """Cumulative return of `ticker` split into factor and idiosyncratic parts.
+
+    Uses the betas of the last window in `fit` (the full sample by default).
+    Daily returns are summed, so the parts add up exactly to "total".
+    """
+    fit = fit or rolling_ols(returns[[ticker]], factors)
+    r = returns[ticker]
+    keep = r.notna() & factors.notna().all(axis=1)
+    parts = pd.DataFrame(index=r.index[keep])
+    for name in factors.columns:
+        parts[name] = factors.loc[keep, name] * fit[f"beta_{name}"][ticker].iloc[-1]
+    parts["idiosyncratic"] = r[keep] - parts.sum(axis=1)
+    cum = parts.cumsum() * 100
+    cum["total"] = r[keep].cumsum() * 100
+    return cum
@@ -0,0 +1,135 @@
+"""Opt-in live quote mode for the dashboard.
+
+A single background worker polls a quote feed on an interval and keeps the
+recent ticks in a bounded ring buffer. Sessions never poll the feed
+themselves: each one pulls the ticks it has not seen yet, capped per update,
+so feed traffic and per-update work stay constant however many sessions are
+connected. The worker stops once nobody has read from it for a few intervals
+and restarts on the next read.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class YFinanceQuoteFeed:
+    """Latest trade prices from Yahoo Finance."""
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+
+    def poll(self):
+        import yfinance as yf
+
+        book = yf.Tickers(" ".join(self.tickers))
+        quotes = {}
+        for t in self.tickers:
+            try:
+                quotes[t] = float(book.tickers[t].fast_info["last_price"])
+            except Exception:
+                continue
+        return quotes
+
+
+class FakeQuoteFeed:
+    """Deterministic random-walk feed for local runs and tests."""
+
+    def __init__(self, start_prices, vol=0.002, seed=0):
+        self.prices = {t: float(p) for t, p in start_prices.items()}
+        self.vol = vol
+        self._rng = np.random.default_rng(seed)
+
+    def poll(self):
+        shocks = self._rng.normal(0.0, self.vol, len(self.prices))
+        for t, shock in zip(list(self.prices), shocks):
+            self.prices[t] *= float(np.exp(shock))
+        return dict(self.prices)
+
+
+class QuoteStream:
+    """Background poller shared by every session."""
+
+    def __init__(self, feed, interval=15, history=500, idle_intervals=4):
+        self.feed = feed
+        self.interval = interval
+        self.idle_after = idle_intervals * interval      # seconds without a reader before stopping
+        self._last_read = time.monotonic()
+        self._idled = threading.Event()               # set when the worker stopped for lack of readers
+        self._ticks = deque(maxlen=history)   # (seq, timestamp, {ticker: price})
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._last_read = time.monotonic()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._idled.clear()
+                self._thread = threading.Thread(target=self._run, name="quote-stream", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+
+    def poll_once(self):
+        """Fetch one round of quotes; returns the new tick's sequence number."""
+        try:
+            quotes = self.feed.poll()
+        except Exception:
+            return self._seq
+        if not quotes:
+            return self._seq
+        with self._lock:
+            self._seq += 1
+            self._ticks.append((self._seq, pd.Timestamp.now(), quotes))
+            return self._seq
+
+    def _run(self):
+        self.poll_once()
+        while not self._stop.wait(self.interval):
+            if self.idle():
+                self._idled.set()          # no session is watching: stop calling the feed
+                break
+            self.poll_once()
+
+    def idle(self):
+        return time.monotonic() - self._last_read > self.idle_after
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _touch(self):
+        self._last_read = time.monotonic()
+        if self._idled.is_set():
+            self.start()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def latest(self, ticker):
+        """Most recent price for `ticker`, or None if it has not been quoted."""
+        self._touch()
+        with self._lock:
+            for _, _, quotes in reversed(self._ticks):
+                if ticker in quotes:
+                    return quotes[ticker]
+        return None
+
+    def since(self, seq, limit=50):
+        """Ticks newer than `seq`, keeping only the most recent `limit`."""
+        self._touch()
+        with self._lock:
+            ticks = [tick for tick in self._ticks if tick[0] > seq]
+        return ticks[-limit:]
+
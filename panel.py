@@ -0,0 +1,118 @@
+"""Trading-calendar aligned price panel.
+
+Owns ticker-rename stitching, the cleaning of raw closes (ordering, duplicate
+sessions, empty rows), the trading calendar with O(1) date -> row lookup and
+each ticker's listing range, so the dashboard, the API and the exports all see
+the same panel instead of each doing its own reindex/dropna pass. Tickers
+that list late (KLAR) or trade under a new symbol (SQ -> XYZ) keep NaN outside
+their listing range rather than knocking whole rows out of the panel.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Canonical ticker -> [(source symbol, first date it applies from)], oldest first
+RENAMES = {
+    "SQ": [("SQ", None), ("XYZ", "2025-01-21")],   # Block, Inc. renamed its ticker Jan 2025
+}
+
+
+def source_symbols(tickers, renames=RENAMES):
+    """Symbols to download so that every canonical ticker can be stitched."""
+    symbols = []
+    for t in tickers:
+        for symbol, _ in renames.get(t, [(t, None)]):
+            if symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
+
+
+def stitch(raw, renames=RENAMES):
+    """Combine per-symbol columns into one column per canonical ticker."""
+    out = raw.copy()
+    for ticker, history in renames.items():
+        present = [(s, since) for s, since in history if s in raw.columns]
+        if not present:
+            continue
+        col = pd.Series(np.nan, index=raw.index)
+        for symbol, since in present:
+            live = raw.index >= pd.Timestamp(since) if since else np.ones(len(raw), dtype=bool)
+            col = col.where(~live | raw[symbol].isna(), raw[symbol])
+        out = out.drop(columns=[s for s, _ in present if s != ticker])
+        out[ticker] = col
+    return out
+
+
+def clean(raw, renames=RENAMES):
+    """Stitched closes in date order, one row per session, no all-missing rows.
+
+    Where a session appears twice the later row wins.
+    """
+    prices = stitch(raw.sort_index(kind="stable"), renames)
+    prices = prices[~prices.index.duplicated(keep="last")]
+    return prices.dropna(how="all")
+
+
+def asof_position(calendar, date):
+    """Position of the last entry of a sorted DatetimeIndex on or before `date`, or -1."""
+    return int(calendar.searchsorted(pd.Timestamp(date), side="right")) - 1
+
+
+def last_close(prices, ticker):
+    """Latest close of `ticker` in a price frame, or None if it has none."""
+    if prices is None or ticker not in prices.columns:
+        return None
+    closes = prices[ticker].dropna()
+    return float(closes.iloc[-1]) if len(closes) else None
+
+
+class PricePanel:
+    """Close prices on a fixed trading calendar with per-ticker listing ranges."""
+
+    def __init__(self, raw, renames=RENAMES):
+        self.prices = clean(raw, renames)
+        self.calendar = self.prices.index
+        self._row = {d: i for i, d in enumerate(self.calendar)}
+
+        values = self.prices.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        listed = valid.any(axis=0)
+        first = np.where(listed, valid.argmax(axis=0), -1)
+        last = np.where(listed, len(values) - 1 - valid[::-1].argmax(axis=0), -1)
+        self._first_row = first
+        self.listing = pd.DataFrame({
+            "first": [self.calendar[i] if i >= 0 else pd.NaT for i in first],
+            "last":  [self.calendar[i] if i >= 0 else pd.NaT for i in last],
+            "n_obs": valid.sum(axis=0),
+        }, index=self.prices.columns)
+
+    def row(self, date):
+        """Calendar row of a trading date (O(1)); KeyError if not a session."""
+        return self._row[pd.Timestamp(date)]
+
+    def asof_row(self, date):
+        """Row of the last session on or before `date`, or -1 if before the calendar."""
+        return asof_position(self.calendar, date)
+
+    def rows(self, start=None, end=None):
+        """Slice of calendar rows for the sessions between `start` and `end`, inclusive."""
+        if start is None:
+            lo = 0
+        else:
+            try:
+                lo = self.row(start)
+            except KeyError:
+                lo = self.asof_row(start) + 1
+        hi = len(self.calendar) if end is None else self.asof_row(end) + 1
+        return slice(lo, max(lo, hi))
+
+    def rebased(self, base=100.0):
+        """Each ticker divided by its own first valid close (from `listing`), times `base`."""
+        values = self.prices.to_numpy(dtype=np.float64)
+        cols = np.arange(values.shape[1])
+        first_px = np.where(self._first_row >= 0, values[self._first_row.clip(0), cols], np.nan)
+        return pd.DataFrame(values / first_px * base, index=self.calendar, columns=self.prices.columns)
+
+    def returns(self):
+        """Daily simple returns; NaN outside a ticker's listing, no rows dropped."""
+        return self.prices.pct_change(fill_method=None).iloc[1:]
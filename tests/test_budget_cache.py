@@ -0,0 +1,133 @@
+import threading
+import time
+
+import numpy as np
+
+from budget_cache import BudgetCache, cached
+
+
+def block(n_floats, fill=0.0):
+    return np.full(n_floats, fill)          # n_floats * 8 bytes
+
+
+def make_cache(tmp_path, memory=1000, disk=10_000):
+    return BudgetCache(memory_budget=memory, disk_budget=disk, spill_dir=tmp_path)
+
+
+def test_evicts_the_coldest_entry_first(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("ns", "a", block(50))
+    cache.put("ns", "b", block(50))
+    cache.get("ns", "a")                    # a is now hotter than b
+    cache.put("ns", "c", block(50))
+    assert cache.memory_bytes <= 1000
+    assert set(cache._entries) == {("ns", "a"), ("ns", "c")}
+    assert cache.stats().loc["ns", "evictions"] == 1
+
+
+def test_evicted_entry_spills_and_is_promoted_on_hit(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("ns", "a", block(50, 1.0))
+    cache.put("ns", "b", block(50, 2.0))
+    cache.put("ns", "c", block(50, 3.0))
+    assert ("ns", "a") in cache._disk and ("ns", "a") not in cache._entries
+
+    value = cache.get("ns", "a")
+    assert np.array_equal(value, block(50, 1.0))
+    assert ("ns", "a") in cache._entries and ("ns", "a") not in cache._disk
+    stats = cache.stats().loc["ns"]
+    assert stats["disk_hits"] == 1 and stats["misses"] == 0
+
+
+def test_value_over_memory_budget_lives_on_disk_only(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("ns", "small", block(10))
+    cache.put("ns", "big", block(200))
+    assert ("ns", "big") in cache._disk
+    assert ("ns", "small") in cache._entries
+
+
+def test_value_over_disk_budget_keeps_other_spills(tmp_path):
+    cache = make_cache(tmp_path, memory=1000, disk=2000)
+    cache.put("ns", "a", block(50))
+    cache.put("ns", "b", block(50))
+    cache.put("ns", "c", block(50))                  # spills a
+    assert ("ns", "a") in cache._disk
+
+    cache.put("ns", "huge", block(1000))            # 8 KB: fits neither tier
+    assert ("ns", "a") in cache._disk
+    assert ("ns", "huge") not in cache._disk and ("ns", "huge") not in cache._entries
+    assert not list((tmp_path / "ns").glob("huge.*"))
+    assert cache.get("ns", "huge") is None
+
+
+def test_disk_tier_stays_under_its_budget(tmp_path):
+    cache = make_cache(tmp_path, memory=500, disk=1500)
+    for i in range(10):
+        cache.put("ns", str(i), block(50, i))
+    assert 0 < cache._disk_bytes <= 1500
+    assert sum(p.stat().st_size for p in tmp_path.rglob("*.pkl")) == cache._disk_bytes
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("ns", "a", block(10), ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("ns", "a") is None
+    assert cache.memory_bytes == 0
+
+
+def test_concurrent_misses_compute_once_across_wrappers(tmp_path):
+    cache = make_cache(tmp_path)
+    calls, gate = [], threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        gate.wait(1)
+        return block(10, x)
+
+    # Two wrappers of one function, as a Streamlit rerun would re-create them
+    wrappers = [cached("ns", cache=cache)(slow) for _ in range(2)]
+    results = []
+    threads = [threading.Thread(target=lambda w=w: results.append(w(7))) for w in wrappers * 3]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert calls == [7]
+    assert len(results) == 6 and all(np.array_equal(r, block(10, 7)) for r in results)
+    assert cache._inflight == {}
+
+
+class SlowToPickle:
+    """Pickles to ~600 bytes; blocks in pickling while `hold` is set."""
+    hold, pickling, release = False, threading.Event(), threading.Event()
+
+    def __reduce__(self):
+        if SlowToPickle.hold:
+            SlowToPickle.pickling.set()
+            SlowToPickle.release.wait(2)
+        return SlowToPickle, (), {"payload": b"x" * 600}
+
+
+def test_hits_do_not_wait_for_a_spill_write(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("ns", "hot", block(10))
+    slow = SlowToPickle()
+    cache.put("ns", "slow", slow)
+    SlowToPickle.hold = True
+    try:
+        writer = threading.Thread(target=cache.put, args=("ns", "new", block(50)))
+        writer.start()                                  # evicts "slow" and blocks writing it out
+        assert SlowToPickle.pickling.wait(2)
+        started = time.monotonic()
+        assert cache.get("ns", "hot") is not None
+        assert cache.get("ns", "slow") is slow          # still served while being spilled
+        assert time.monotonic() - started < 0.5
+    finally:
+        SlowToPickle.release.set()
+        writer.join()
+        SlowToPickle.hold = False
+    assert ("ns", "slow") in cache._disk and not cache._spilling
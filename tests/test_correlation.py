@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import (clustered_correlation, intensity, ledoit_wolf_intensity, pairwise_corr,
+                         top_k_neighbours)
+
+
+def ragged_returns(t=120, n=7, seed=0):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(size=(t, 1))
+    data = 0.6 * common + rng.normal(size=(t, n))
+    df = pd.DataFrame(data, columns=[f"T{i}" for i in range(n)])
+    df.iloc[:30, 1] = np.nan                  # late listing
+    df.iloc[50:60, 2] = np.nan                # gap
+    df.iloc[::7, 3] = np.nan                  # scattered missing days
+    df["EMPTY"] = np.nan                      # no history at all
+    return df
+
+
+def test_pairwise_corr_matches_pandas_for_any_block_size():
+    returns = ragged_returns()
+    expected = returns.corr(min_periods=20).to_numpy(copy=True)
+    np.fill_diagonal(expected, 1.0)
+    for block in (1, 3, 256):
+        got = pairwise_corr(returns, block=block)
+        np.testing.assert_allclose(got.to_numpy(), expected, atol=1e-10)
+
+
+def test_ledoit_wolf_blocked_matches_dense_estimate():
+    returns = ragged_returns()
+    z = (returns - returns.mean()) / returns.std()
+    x = np.nan_to_num(z.to_numpy())
+    t, n = x.shape
+    s = x.T @ x / t
+    mu = np.trace(s) / n
+    delta = np.sum((s - mu * np.eye(n)) ** 2) / n
+    beta = sum(np.sum((np.outer(row, row) - s) ** 2) for row in x) / (t * t * n)
+    expected = min(beta / delta, 1.0)
+    for block in (1, 2, 256):
+        assert ledoit_wolf_intensity(returns, block=block) == pytest.approx(expected)
+
+
+def test_shrinkage_keeps_pairs_without_data_missing():
+    returns = ragged_returns()
+    corr, labels = clustered_correlation(returns, shrinkage="ledoit-wolf")
+    assert corr.loc["EMPTY"].drop("EMPTY").isna().all()
+    assert list(corr.columns)[-1] == "EMPTY" and labels["EMPTY"] == 0
+    assert (labels.drop("EMPTY") > 0).all()
+
+
+def test_intensity_rejects_values_outside_unit_interval():
+    returns = ragged_returns()
+    assert intensity(returns, None) == 0.0
+    assert intensity(returns, 0.3) == 0.3
+    for bad in (-0.1, 2):
+        with pytest.raises(ValueError):
+            intensity(returns, bad)
+
+
+def test_top_k_neighbours_match_the_full_matrix():
+    returns = ragged_returns()
+    corr = pairwise_corr(returns)
+    got = top_k_neighbours(returns, k=2, block=3, shrinkage=0.5)
+    for ticker, rows in got.groupby("ticker"):
+        expected = corr[ticker].drop(ticker).dropna().nlargest(2)
+        assert list(rows["neighbour"]) == list(expected.index)
+        np.testing.assert_allclose(rows["corr"], expected.to_numpy() * 0.5)
+    assert "EMPTY" not in set(got["ticker"]) | set(got["neighbour"])
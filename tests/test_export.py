@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import export
+from panel import PricePanel
+
+
+@pytest.fixture
+def prices_csv(tmp_path):
+    index = pd.bdate_range("2026-01-01", periods=40, name="Date")
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (40, 2)), axis=0)),
+                      index=index, columns=["AFRM", "KLAR"])
+    df.iloc[:5, 1] = np.nan                                        # KLAR lists late
+    dup = df.iloc[[12]] * 1.5                                      # re-downloaded session: later row wins
+    raw = pd.concat([df.iloc[:13], dup, df.iloc[13:]])
+    path = tmp_path / "prices.csv"
+    raw.to_csv(path)
+    return path
+
+
+def read_all(chunks):
+    return pd.concat(list(chunks))
+
+
+def test_prices_match_the_panel_at_any_chunk_size(prices_csv):
+    expected = PricePanel(pd.read_csv(prices_csv, index_col="Date", parse_dates=True)).prices
+    for chunksize in (1, 7, 13, 1000):
+        got = read_all(export.iter_prices(chunksize=chunksize, path=prices_csv))
+        pd.testing.assert_frame_equal(got, expected.rename_axis("date"), check_freq=False)
+
+
+def test_start_filters_match_a_full_read(prices_csv):
+    full_returns = read_all(export.iter_returns(path=prices_csv))
+    full_rolling = read_all(export.iter_rolling(window=5, path=prices_csv))
+    for start in ("2026-01-05", "2026-01-19", "2026-01-20"):
+        returns = read_all(export.iter_returns(start=start, chunksize=6, path=prices_csv))
+        assert returns.index[0] == pd.Timestamp(start)
+        pd.testing.assert_frame_equal(returns, full_returns.loc[start:])
+        rolling = read_all(export.iter_rolling(start=start, window=5, chunksize=6, path=prices_csv))
+        pd.testing.assert_frame_equal(rolling, full_rolling.loc[start:])
+
+
+def test_empty_range_still_writes_a_typed_file(prices_csv):
+    out = io.BytesIO()
+    rows = export.write_chunks(export.iter_prices(start="2030-01-01", path=prices_csv), out, "parquet")
+    out.seek(0)
+    table = pq.read_table(out)
+    assert rows == 0 and table.schema.field("date").type == "date32[day]"
+    assert table.schema.field("AFRM").type == "double"
+
+
+def test_estimate_scales_with_range_and_tickers(prices_csv):
+    full = export.estimate_bytes("prices", "parquet", path=prices_csv)
+    assert full == 40 * 3 * 8
+    assert export.estimate_bytes("prices", "parquet", ["KLAR"], "2026-01-01", "2026-01-09", path=prices_csv) == 7 * 2 * 8
+    assert export.estimate_bytes("prices", "csv", path=prices_csv) > full
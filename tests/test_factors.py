@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from factors import MARKET, attribution, factor_fits, factor_returns, rolling_ols
+
+
+def ragged_returns(t=150, seed=1):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2025-01-01", periods=t)
+    mkt = rng.normal(0, 0.01, t)
+    df = pd.DataFrame({MARKET: mkt}, index=index)
+    for i, name in enumerate(["AFRM", "PYPL", "SQ", "KLAR"]):
+        df[name] = 0.0005 * i + (1 + 0.3 * i) * mkt + rng.normal(0, 0.02, t)
+    df.iloc[:40, df.columns.get_loc("KLAR")] = np.nan              # late listing
+    df.iloc[70:80, df.columns.get_loc("PYPL")] = np.nan            # gap
+    df.iloc[::9, df.columns.get_loc(MARKET)] = np.nan              # missing factor days
+    return df
+
+
+def lstsq_fit(y, factors):
+    """Reference OLS of one series on factors plus an intercept, dropping incomplete days."""
+    both = pd.concat([y, factors], axis=1).dropna()
+    if len(both) < 2:
+        return None, None, len(both)
+    x = np.column_stack([np.ones(len(both)), both.iloc[:, 1:].to_numpy()])
+    beta, *_ = np.linalg.lstsq(x, both.iloc[:, 0].to_numpy(), rcond=None)
+    resid = both.iloc[:, 0].to_numpy() - x @ beta
+    r2 = 1 - resid @ resid / np.sum((both.iloc[:, 0] - both.iloc[:, 0].mean()) ** 2)
+    return beta, r2, len(both)
+
+
+def test_rolling_ols_matches_lstsq_on_ragged_data():
+    returns = ragged_returns()
+    factors = factor_returns(returns)
+    stocks = returns.drop(columns=[MARKET])
+    window = 30
+    fit = rolling_ols(stocks, factors, window, min_obs=10)
+    for end in (29, 60, 75, 149):
+        rows = slice(end - window + 1, end + 1)
+        for ticker in stocks.columns:
+            beta, r2, n = lstsq_fit(stocks[ticker].iloc[rows], factors.iloc[rows])
+            date = returns.index[end]
+            assert fit["n_obs"].loc[date, ticker] == n
+            if n < 10:
+                assert np.isnan(fit["alpha"].loc[date, ticker])
+                continue
+            got = [fit[k].loc[date, ticker] for k in ("alpha", "beta_market", "beta_sector")]
+            np.testing.assert_allclose(got, beta, rtol=1e-8, atol=1e-12)
+            assert fit["r2"].loc[date, ticker] == pytest.approx(r2)
+
+
+def test_full_sample_fit_is_one_window():
+    returns = ragged_returns()
+    factors = factor_returns(returns)
+    fit = rolling_ols(returns[["KLAR"]], factors)
+    beta, _, n = lstsq_fit(returns["KLAR"], factors)
+    assert list(fit["alpha"].index) == [returns.index[-1]]
+    np.testing.assert_allclose([fit["beta_market"].iloc[-1, 0], fit["beta_sector"].iloc[-1, 0]], beta[1:])
+
+
+def test_sector_members_use_a_leave_one_out_factor():
+    returns = ragged_returns()
+    fits = factor_fits(returns)
+    assert list(fits["alpha"].columns) == ["AFRM", "PYPL", "SQ", "KLAR"]
+    for ticker in ("AFRM", "PYPL", "SQ"):
+        own = rolling_ols(returns[[ticker]], factor_returns(returns, exclude=ticker))
+        assert fits["beta_sector"][ticker].iloc[-1] == pytest.approx(own["beta_sector"][ticker].iloc[-1])
+    klar = rolling_ols(returns[["KLAR"]], factor_returns(returns))
+    assert fits["beta_sector"]["KLAR"].iloc[-1] == pytest.approx(klar["beta_sector"]["KLAR"].iloc[-1])
+
+
+def test_attribution_parts_sum_to_total():
+    returns = ragged_returns()
+    factors = factor_returns(returns)
+    cum = attribution(returns, factors, "KLAR")
+    parts = cum[["market", "sector", "idiosyncratic"]].sum(axis=1)
+    np.testing.assert_allclose(parts, cum["total"], atol=1e-10)
+    assert cum.index[0] >= returns.index[40]                        # starts once KLAR lists
+
+
+def test_factor_fits_without_market_or_stocks_are_empty():
+    returns = ragged_returns()
+    for subset in (returns.drop(columns=[MARKET]), returns[[MARKET]]):
+        fits = factor_fits(subset, window=20)
+        assert set(fits) == {"alpha", "beta_market", "beta_sector", "r2", "resid_vol", "n_obs"}
+        assert all(f.empty for f in fits.values())
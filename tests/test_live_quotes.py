@@ -0,0 +1,69 @@
+import time
+
+from live_quotes import FakeQuoteFeed, QuoteStream
+
+START = {"KLAR": 20.0, "AFRM": 60.0}
+
+
+def test_fake_feed_is_deterministic():
+    a, b = FakeQuoteFeed(START, seed=1), FakeQuoteFeed(START, seed=1)
+    assert [a.poll() for _ in range(3)] == [b.poll() for _ in range(3)]
+    assert set(a.poll()) == set(START)
+
+
+def test_poll_once_appends_ticks_in_sequence():
+    stream = QuoteStream(FakeQuoteFeed(START), interval=60)
+    assert stream.seq == 0 and stream.latest("KLAR") is None
+    assert [stream.poll_once() for _ in range(3)] == [1, 2, 3]
+    assert [seq for seq, _, _ in stream.since(0)] == [1, 2, 3]
+    assert [seq for seq, _, _ in stream.since(2)] == [3]
+    assert stream.since(3) == []
+
+
+def test_latest_is_the_newest_quote():
+    feed = FakeQuoteFeed(START)
+    stream = QuoteStream(feed, interval=60)
+    stream.poll_once()
+    stream.poll_once()
+    assert stream.latest("KLAR") == feed.prices["KLAR"]
+    assert stream.latest("MISSING") is None
+
+
+def test_since_limit_and_ring_buffer_bound():
+    stream = QuoteStream(FakeQuoteFeed(START), interval=60, history=5)
+    for _ in range(12):
+        stream.poll_once()
+    assert [seq for seq, _, _ in stream.since(0)] == [8, 9, 10, 11, 12]
+    assert [seq for seq, _, _ in stream.since(0, limit=2)] == [11, 12]
+
+
+def test_failed_or_empty_poll_adds_no_tick():
+    class Broken:
+        def poll(self):
+            raise RuntimeError("feed down")
+
+    class Empty:
+        def poll(self):
+            return {}
+
+    for feed in (Broken(), Empty()):
+        stream = QuoteStream(feed, interval=60)
+        assert stream.poll_once() == 0
+        assert stream.since(0) == []
+
+
+def test_worker_stops_without_readers_and_restarts_on_read():
+    stream = QuoteStream(FakeQuoteFeed(START), interval=0.02, idle_intervals=3).start()
+    deadline = time.monotonic() + 2
+    while stream.running and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not stream.running
+    seq = stream.seq
+
+    stream.latest("KLAR")          # a reader comes back
+    deadline = time.monotonic() + 2
+    while stream.seq == seq and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert stream.seq > seq
+    stream.stop()
+    assert not stream.running
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel import PricePanel, clean
+
+DATES = pd.to_datetime(["2025-01-17", "2025-01-20", "2025-01-21", "2025-01-22", "2025-01-23"])
+
+
+def raw_closes():
+    return pd.DataFrame({
+        "AFRM": [10.0, 11.0, 12.0, 13.0, 14.0],
+        "KLAR": [np.nan, np.nan, 40.0, 42.0, 44.0],     # lists late
+        "SQ":   [70.0, 71.0, np.nan, np.nan, np.nan],   # renamed to XYZ on Jan 21
+        "XYZ":  [np.nan, np.nan, 72.0, 73.0, 74.0],
+    }, index=DATES)
+
+
+def test_clean_stitches_dedups_and_drops_empty_rows():
+    raw = raw_closes()
+    later = raw.iloc[[1]].assign(AFRM=22.0)
+    empty = pd.DataFrame(np.nan, index=[pd.Timestamp("2025-01-24")], columns=raw.columns)
+    prices = clean(pd.concat([raw, later, empty]))
+    assert list(prices.columns) == ["AFRM", "KLAR", "SQ"]
+    assert list(prices.index) == list(DATES)
+    assert prices.loc["2025-01-20", "AFRM"] == 22.0                   # the later duplicate wins
+    assert prices["SQ"].tolist() == [70.0, 71.0, 72.0, 73.0, 74.0]
+
+
+def test_listing_ranges_and_rebase():
+    panel = PricePanel(raw_closes())
+    assert panel.listing.loc["KLAR", "first"] == pd.Timestamp("2025-01-21")
+    assert panel.listing.loc["KLAR", "n_obs"] == 3
+    rebased = panel.rebased()
+    assert np.allclose(rebased["KLAR"].iloc[2:], [100.0, 105.0, 110.0])
+    assert rebased["KLAR"].iloc[:2].isna().all()
+
+
+def test_row_lookup_and_date_slices():
+    panel = PricePanel(raw_closes())
+    assert panel.row("2025-01-21") == 2
+    with pytest.raises(KeyError):
+        panel.row("2025-01-18")                                      # not a session
+    assert panel.asof_row("2025-01-18") == 0
+    assert panel.asof_row("2024-12-31") == -1
+    assert panel.rows("2025-01-18", "2025-01-21") == slice(1, 3)
+    assert panel.rows("2025-01-20") == slice(1, 5)
+    assert panel.rows(end="2024-12-31") == slice(0, 0)
+    assert panel.rows("2025-02-01") == slice(5, 5)
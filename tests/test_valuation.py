@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import get_static_data
+from panel import last_close
+from valuation import base_case, grid_axes, scenario_grid
+
+
+def test_base_case_prices_off_the_latest_close():
+    annual, _, valuation = get_static_data()[:3]
+    stored = base_case(annual, valuation)
+    assert stored["price"] == pytest.approx(valuation["price"].iloc[-1])
+    prices = pd.DataFrame({"KLAR": [np.nan, 15.0, 14.0, np.nan]}, index=pd.bdate_range("2026-03-02", periods=4))
+    live = base_case(annual, valuation, last_close(prices, "KLAR"))
+    assert live["price"] == 14.0
+    assert live["shares_m"] == stored["shares_m"]                   # share count stays on the valuation row
+    assert last_close(prices, "AFRM") is None and last_close(None, "KLAR") is None
+
+
+def test_scenario_grid_shape_and_monotone_in_multiple():
+    annual, _, valuation = get_static_data()[:3]
+    axes = grid_axes((0, 20), (2.0, 3.0), (0, 10), (1.0, 4.0), shape=(3, 2, 2, 4))
+    grid = scenario_grid(base_case(annual, valuation), *axes, horizon=2, discount=0.0)
+    assert grid["price"].shape == (3, 2, 2, 4)
+    assert (np.diff(grid["price"], axis=-1) >= 0).all()
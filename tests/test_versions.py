@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from budget_cache import BudgetCache
+from versions import VersionStore
+
+
+def make_store(tmp_path):
+    return VersionStore(tmp_path / "store", cache=BudgetCache(spill_dir=tmp_path / "spill"))
+
+
+def prices(last_close):
+    index = pd.bdate_range("2026-01-26", "2026-02-06")
+    closes = np.linspace(10.0, 20.0, len(index))
+    closes[-1] = last_close
+    return pd.DataFrame({"KLAR": closes}, index=index)
+
+
+def stored_objects(store):
+    return sorted(p.stem for p in store.objects.rglob("*.arrow"))
+
+
+def test_versions_share_unchanged_chunks(tmp_path):
+    store = make_store(tmp_path)
+    first = store.commit("2026-02-05", {"prices": prices(20.0).loc[:"2026-02-05"]})
+    second = store.commit("2026-02-06", {"prices": prices(20.0)})
+    assert first["datasets"]["prices"][0] == second["datasets"]["prices"][0]    # January chunk
+    assert len(stored_objects(store)) == 3
+    assert store.resolve("2026-02-07") == pd.Timestamp("2026-02-06")
+    assert store.resolve("2026-01-01") is None
+
+
+def test_recommitting_a_day_deletes_chunks_only_it_used(tmp_path):
+    store = make_store(tmp_path)
+    store.commit("2026-02-05", {"prices": prices(20.0).loc[:"2026-02-05"]})
+    for close in (20.5, 21.0, 21.5, 22.0, 22.5):                               # intraday re-commits
+        manifest = store.commit("2026-02-06", {"prices": prices(close),
+                                               "risk_return": pd.DataFrame({"ann_vol": [close]})})
+    live = {key for v in store.versions() for keys in store.manifest(v)["datasets"].values() for key in keys}
+    assert set(stored_objects(store)) == live
+    assert manifest["removed_bytes"] > 0
+    pd.testing.assert_frame_equal(store.load("2026-02-06", "prices"), prices(22.5), check_freq=False)
+
+
+def test_gc_sweeps_orphaned_chunks(tmp_path):
+    store = make_store(tmp_path)
+    store.commit("2026-02-06", {"prices": prices(20.0)})
+    orphan = store.objects / "ab" / ("ab" + "0" * 38 + ".arrow")
+    orphan.parent.mkdir(parents=True, exist_ok=True)
+    orphan.write_bytes(b"x" * 10)
+    assert store.gc() == 10
+    assert not orphan.exists() and len(stored_objects(store)) == 2
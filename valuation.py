@@ -0,0 +1,105 @@
+"""Scenario-grid valuation of KLAR.
+
+Evaluates every combination of GMV growth, exit take rate, exit net margin and
+exit P/S multiple as one broadcast array expression: a 40 x 25 x 25 x 20 grid
+(500k scenarios) is a handful of numpy operations. The implied share price of
+a scenario is
+
+    (revenue_H x P/S  +  cumulative net income over the horizon)
+    / (1 + discount)^H / shares outstanding
+
+with take rate and margin moving linearly from today's values to the
+scenario's exit values. Growth is applied to GMV (revenue = GMV x take rate),
+so revenue growth is implied rather than a separate, double-counted input.
+"""
+
+import numpy as np
+import pandas as pd
+
+from budget_cache import cached
+
+AXES = ("growth", "take_rate", "margin", "ps")
+
+# Default (low, high) range of each axis and the number of points along it
+DEFAULT_RANGES = {"growth": (0, 40), "take_rate": (2.0, 3.5), "margin": (-10, 15), "ps": (1.0, 6.0)}
+GRID_SHAPE     = (40, 25, 25, 20)
+
+
+def base_case(klarna_annual, valuation, price=None):
+    """Latest-year fundamentals and share count implied by the current valuation.
+
+    `price` is the latest KLAR close when prices are loaded; without one the
+    price of the last `valuation` row is used. The share count always comes
+    from that row (market cap / price on the same day).
+    """
+    last = klarna_annual.iloc[-1]
+    current = valuation.iloc[-1]
+    return {
+        "revenue_m":  float(last["revenue_m"]),
+        "gmv_m":      float(last["gmv_b"]) * 1000,
+        "take_rate":  float(last["revenue_m"] / (last["gmv_b"] * 1000) * 100),
+        "margin":     float(last["net_income_m"] / last["revenue_m"] * 100),
+        "shares_m":   float(current["valuation_b"] * 1000 / current["price"]),
+        "price":      float(current["price"] if price is None else price),
+    }
+
+
+def grid_axes(growth, take_rate, margin, ps, shape=GRID_SHAPE):
+    """Evenly spaced values for each (low, high) range, as hashable tuples."""
+    return [tuple(np.linspace(lo, hi, n)) for (lo, hi), n in zip((growth, take_rate, margin, ps), shape)]
+
+
+@cached("valuation")
+def scenario_grid(base, growth, take_rate, margin, ps, horizon=3, discount=10.0):
+    """Implied share price for every combination of the assumption axes.
+
+    `growth`, `take_rate`, `margin` (all %) and `ps` are 1-D sequences; the
+    result's "price" array has shape (len(growth), len(take_rate),
+    len(margin), len(ps)). Results are cached per assumption set.
+    """
+    g    = np.asarray(growth, dtype=np.float64)[:, None, None, None, None] / 100
+    tr   = np.asarray(take_rate, dtype=np.float64)[None, :, None, None, None] / 100
+    m    = np.asarray(margin, dtype=np.float64)[None, None, :, None, None] / 100
+    mult = np.asarray(ps, dtype=np.float64)[None, None, None, :]
+    t    = np.arange(1, horizon + 1, dtype=np.float64)                 # years 1..H on the last axis
+
+    ramp = t / horizon
+    gmv     = base["gmv_m"] * (1 + g) ** t                              # (G, 1, 1, 1, H)
+    tr_path = base["take_rate"] / 100 + (tr - base["take_rate"] / 100) * ramp
+    m_path  = base["margin"] / 100 + (m - base["margin"] / 100) * ramp
+    revenue = gmv * tr_path                                             # (G, T, 1, 1, H)
+    earned  = (revenue * m_path).sum(axis=-1)                           # (G, T, M, 1)
+
+    equity  = revenue[..., -1] * mult + earned                          # (G, T, M, P), $M
+    price   = equity / (1 + discount / 100) ** horizon / base["shares_m"]
+    return {
+        "axes":  dict(zip(AXES, map(np.asarray, (growth, take_rate, margin, ps)))),
+        "price": np.maximum(price, 0.0),
+    }
+
+
+def price_distribution(grid, bins=60):
+    """Percentiles and a pre-binned histogram of the implied prices.
+
+    Binning here keeps the chart payload at `bins` bars however many
+    scenarios the grid holds.
+    """
+    prices = grid["price"].ravel()
+    counts, edges = np.histogram(prices, bins=bins)
+    p10, p25, median, p75, p90 = np.percentile(prices, [10, 25, 50, 75, 90]).tolist()
+    return {
+        "n":      prices.size,
+        "p10":    p10, "p25": p25, "median": median, "p75": p75, "p90": p90,
+        "mean":   float(prices.mean()),
+        "hist":   pd.DataFrame({"left": edges[:-1], "right": edges[1:], "count": counts}),
+    }
+
+
+def sensitivity(grid, x, y, stat=np.median):
+    """`stat` of implied price over every axis except `x` and `y`."""
+    ix, iy = AXES.index(x), AXES.index(y)
+    other = tuple(i for i in range(len(AXES)) if i not in (ix, iy))
+    surface = stat(grid["price"], axis=other)
+    if ix > iy:
+        surface = surface.T
+    return pd.DataFrame(surface.T, index=grid["axes"][y], columns=grid["axes"][x])
@@ -0,0 +1,231 @@
+"""Copy-on-write, as-of versioned store of everything the dashboard shows.
+
+    python versions.py commit              # snapshot the stored data as of its last price date
+    python versions.py backfill            # one version per trading day in the price file
+    python versions.py list
+    python versions.py gc                  # delete chunks no manifest references
+
+A version is a small JSON manifest naming, for every dataset, the chunks it is
+made of. Chunks are Arrow IPC files addressed by a hash of their content, so
+a chunk shared by many versions is stored once. Prices are chunked by calendar
+month: a new daily version writes only the current month's chunk plus any
+tables that actually changed, and storage grows with deltas, not copies.
+Re-committing a date (the warm-up does so intraday as the last bar moves)
+replaces its manifest and deletes the chunks only the old manifest used.
+Chunks are immutable, so once read they are served from the shared cache.
+
+Only prices, the static tables and the risk/return table are stored. Factor
+fits and correlations are recomputed from the stored prices by the current
+code, so they reproduce that day's inputs, not necessarily that day's output.
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+from budget_cache import CACHE, fingerprint
+from panel import asof_position
+
+VERSION_DIR  = Path(os.environ.get("BNPL_VERSION_DIR", analytics.DATA_DIR / "versions"))
+STATIC_NAMES = ("klarna_annual", "klarna_qtr", "valuation", "delinquency", "late_pay", "market_size", "competitors")
+
+
+def version_datasets(prices, static_data):
+    """Datasets stored in one version: prices, the static tables and the risk/return table.
+
+    Correlations are not stored: the dashboard recomputes them per method,
+    shrinkage and ticker selection from the stored prices.
+    """
+    _, _, returns = analytics.derive_panels(prices)
+    datasets = {"prices": prices}
+    datasets.update(zip(STATIC_NAMES, static_data))
+    datasets["risk_return"] = analytics.risk_return(returns)
+    return datasets
+
+
+class VersionStore:
+    """Content-addressed chunks plus one manifest per as-of date."""
+
+    def __init__(self, root=VERSION_DIR, cache=None):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.manifests = self.root / "manifests"
+        self.cache = cache or CACHE
+
+    # ── Writing ───────────────────────────────────────────────────────────────
+
+    def commit(self, as_of, datasets):
+        """Store `datasets` (name -> DataFrame) as the version for `as_of`.
+
+        Only chunks not already in the store are written. If `as_of` already
+        has a version, chunks that no manifest references any more are
+        deleted. Returns the manifest with the bytes this commit added and
+        removed.
+        """
+        as_of = pd.Timestamp(as_of).normalize()
+        path = self.manifests / f"{as_of:%Y-%m-%d}.json"
+        replaced = _keys(json.loads(path.read_text())) if path.exists() else set()
+        added = 0
+        manifest = {"as_of": f"{as_of:%Y-%m-%d}", "created": pd.Timestamp.now(tz="UTC").isoformat(),
+                    "datasets": {}}
+        for name, df in datasets.items():
+            chunks = []
+            for chunk in self._chunks(df):
+                key = fingerprint(chunk)
+                added += self._write_object(key, chunk)
+                chunks.append(key)
+            manifest["datasets"][name] = chunks
+        manifest["added_bytes"] = added
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps(manifest, indent=1).encode())
+        manifest["removed_bytes"] = self._delete_unreferenced(replaced - _keys(manifest)) if replaced else 0
+        return manifest
+
+    def gc(self):
+        """Delete every chunk no manifest references; returns the bytes freed."""
+        if not self.objects.exists():
+            return 0
+        return self._delete_unreferenced({p.stem for p in self.objects.rglob("*.arrow")})
+
+    def _delete_unreferenced(self, candidates):
+        referenced = set()
+        for p in self.manifests.glob("*.json"):
+            referenced |= _keys(json.loads(p.read_text()))
+        freed = 0
+        for key in candidates - referenced:
+            path = self.objects / key[:2] / f"{key}.arrow"
+            try:
+                freed += path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        return freed
+
+    @staticmethod
+    def _chunks(df):
+        if isinstance(df.index, pd.DatetimeIndex) and len(df):
+            return [g for _, g in df.groupby(df.index.to_period("M"), sort=True)]
+        return [df]
+
+    def _write_object(self, key, chunk):
+        path = self.objects / key[:2] / f"{key}.arrow"
+        if path.exists():
+            return 0
+        table = pa.Table.from_pandas(chunk, preserve_index=True)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = sink.getvalue().to_pybytes()
+        _atomic_write(path, body)
+        return len(body)
+
+    # ── Reading ───────────────────────────────────────────────────────────────
+
+    def versions(self):
+        """As-of dates with a stored version, oldest first."""
+        if not self.manifests.exists():
+            return []
+        return sorted(pd.Timestamp(p.stem) for p in self.manifests.glob("*.json"))
+
+    def resolve(self, as_of):
+        """The latest stored version on or before `as_of`, or None."""
+        versions = pd.DatetimeIndex(self.versions())
+        i = asof_position(versions, pd.Timestamp(as_of).normalize())
+        return versions[i] if i >= 0 else None
+
+    def manifest(self, version):
+        """Manifest of `version`. Not cached: today's version is re-committed as new bars land."""
+        path = self.manifests / f"{pd.Timestamp(version):%Y-%m-%d}.json"
+        if not path.exists():
+            raise KeyError(f"no version {path.stem}")
+        return json.loads(path.read_text())
+
+    def load(self, version, name):
+        """Dataset `name` exactly as committed for `version` (a date or a manifest)."""
+        manifest = version if isinstance(version, dict) else self.manifest(version)
+        chunks = [self._read_object(key) for key in manifest["datasets"][name]]
+        return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+    def _read_object(self, key):
+        chunk = self.cache.get("versions", key)
+        if chunk is None:
+            with pa.memory_map(str(self.objects / key[:2] / f"{key}.arrow")) as source:
+                chunk = pa.ipc.open_file(source).read_all().to_pandas()
+            self.cache.put("versions", key, chunk)
+        return chunk
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+
+    def stats(self):
+        """Versions, unique chunks and bytes stored vs bytes a full copy per version would take."""
+        versions = self.versions()
+        sizes = {p.stem: p.stat().st_size for p in self.objects.rglob("*.arrow")} if self.objects.exists() else {}
+        logical = sum(sizes.get(key, 0) for v in versions
+                      for keys in self.manifest(v)["datasets"].values() for key in keys)
+        return {"versions": len(versions), "chunks": len(sizes),
+                "stored_mb": sum(sizes.values()) / 2**20, "logical_mb": logical / 2**20}
+
+
+def _keys(manifest):
+    return {key for keys in manifest["datasets"].values() for key in keys}
+
+
+def _atomic_write(path, body):
+    tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    tmp.write_bytes(body)
+    os.replace(tmp, path)
+
+
+# ── Snapshots of the stored data ──────────────────────────────────────────────
+
+def commit_snapshot(store, prices=None, static_data=None, as_of=None):
+    """Commit the given (or stored) prices and static data as of their last price date."""
+    if prices is None:
+        prices = analytics.load_price_snapshot()[0]
+    static_data = static_data or analytics.get_static_data()
+    as_of = as_of or prices.index[-1]
+    return store.commit(as_of, version_datasets(prices.loc[:as_of], static_data))
+
+
+def backfill(store, prices=None, static_data=None):
+    """One version per trading day, each seeing only the prices known that day."""
+    if prices is None:
+        prices = analytics.load_price_snapshot()[0]
+    static_data = static_data or analytics.get_static_data()
+    return [commit_snapshot(store, prices, static_data, as_of=d) for d in prices.index]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="As-of versioned snapshots of the dashboard data.")
+    parser.add_argument("command", choices=("commit", "backfill", "list", "gc"))
+    parser.add_argument("--root", default=str(VERSION_DIR))
+    args = parser.parse_args(argv)
+    store = VersionStore(args.root)
+
+    started = time.perf_counter()
+    if args.command == "commit":
+        m = commit_snapshot(store)
+        print(f"committed {m['as_of']} (+{m['added_bytes'] / 1024:.1f} KB, "
+              f"-{m['removed_bytes'] / 1024:.1f} KB)")
+    elif args.command == "backfill":
+        added = sum(m["added_bytes"] for m in backfill(store))
+        print(f"backfilled {len(store.versions())} versions (+{added / 1024:.1f} KB) "
+              f"in {time.perf_counter() - started:.1f}s")
+    elif args.command == "gc":
+        print(f"freed {store.gc() / 1024:.1f} KB")
+    for key, value in store.stats().items():
+        print(f"{key:>11}: {value:,.2f}" if isinstance(value, float) else f"{key:>11}: {value:,}")
+    if args.command == "list":
+        for v in store.versions():
+            print(f"{v:%Y-%m-%d}")
+
+
+if __name__ == "__main__":
+    main()
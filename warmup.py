@@ -0,0 +1,184 @@
+"""Background cache warm-up tied to the US market clock.
+
+One worker per process rebuilds the shared cache when it is started, at the
+market open, shortly after each close, and on a keep-warm interval shorter
+than the cache TTLs. The dashboard starts it from the first page load after
+the server starts (Streamlit has no server-start hook), so that first load
+still waits for the cold fetch; every later one is served warm. A run is a sequence of stages (fetch bars -> analytics ->
+figures). Each stage's jobs are built from the previous stages' results and
+run on a bounded thread pool, so a warm-up never takes more than
+`max_workers` cores from user sessions. Jobs replace cached values in place,
+so sessions keep being served the old entry until the new one is ready.
+
+The clock knows weekends but not exchange holidays; a holiday just gets an
+extra warm-up run on unchanged data.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+MARKET_TZ     = ZoneInfo("America/New_York")
+MARKET_OPEN   = dtime(9, 30)
+MARKET_CLOSE  = dtime(16, 0)
+CLOSE_SETTLE  = timedelta(minutes=int(os.environ.get("BNPL_WARM_SETTLE_MIN", 15)))   # let closing bars land
+WARM_INTERVAL = int(os.environ.get("BNPL_WARM_INTERVAL_MIN", 45)) * 60                 # < shortest cache TTL
+WARM_WORKERS  = int(os.environ.get("BNPL_WARM_WORKERS", 2))
+
+
+# ── Market clock ──────────────────────────────────────────────────────────────
+
+def market_is_open(now=None):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def _next_session_time(at, now=None):
+    """The next weekday `at` (New York time) strictly after `now`."""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    due = datetime.combine(now.date(), at, MARKET_TZ)
+    if due <= now:
+        due += timedelta(days=1)
+    while due.weekday() >= 5:
+        due += timedelta(days=1)
+    return due
+
+
+def next_open(now=None):
+    return _next_session_time(MARKET_OPEN, now)
+
+
+def next_close(now=None):
+    return _next_session_time(MARKET_CLOSE, now)
+
+
+# ── Scheduler ─────────────────────────────────────────────────────────────────
+
+class WarmupScheduler:
+    """Runs staged warm-up jobs in the background and records their progress.
+
+    `stages` is a list of (name, make_jobs). `make_jobs(results)` gets the
+    results of every earlier job by label and returns a list of
+    (label, callable); an empty list skips the stage.
+    """
+
+    def __init__(self, stages, max_workers=WARM_WORKERS, interval=WARM_INTERVAL, settle=CLOSE_SETTLE):
+        self.stages = stages
+        self.max_workers = max_workers
+        self.interval = interval
+        self.settle = settle
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {"state": "idle", "reason": None, "stage": None, "done": 0, "total": 0,
+                        "started": None, "duration": None, "last_run": None, "next_run": None,
+                        "next_reason": None, "runs": 0, "errors": 0}
+        self._jobs = []   # one row per job of the current / last run
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="cache-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def trigger(self):
+        """Start a run now instead of waiting for the next scheduled one."""
+        self._wake.set()
+
+    def next_run(self, now=None):
+        """When the next run is due, and why: open, close or the keep-warm tick."""
+        now = now or datetime.now(MARKET_TZ)
+        return min(
+            (next_close(now - self.settle) + self.settle, "market close"),
+            (next_open(now), "market open"),
+            (now + timedelta(seconds=self.interval), "keep-warm"),
+        )
+
+    # ── Running ───────────────────────────────────────────────────────────────
+
+    def run_once(self, reason="manual"):
+        """Run every stage now; returns the run's duration in seconds."""
+        with self._run_lock:
+            started = time.perf_counter()
+            with self._lock:
+                self._jobs = []
+                self._status.update(state="running", reason=reason, stage=None, done=0, total=0, errors=0,
+                                    started=pd.Timestamp.now(tz=MARKET_TZ))
+            results = {}
+            with ThreadPoolExecutor(self.max_workers, thread_name_prefix="warmup") as pool:
+                for name, make_jobs in self.stages:
+                    try:
+                        jobs = make_jobs(results)
+                    except Exception as e:
+                        self._record(name, "(plan)", None, e)
+                        continue
+                    with self._lock:
+                        self._status["stage"] = name
+                        self._status["total"] += len(jobs)
+                    futures = {pool.submit(self._timed, fn): label for label, fn in jobs}
+                    for future in as_completed(futures):
+                        value, seconds, error = future.result()
+                        results[futures[future]] = value
+                        self._record(name, futures[future], seconds, error)
+
+            duration = time.perf_counter() - started
+            with self._lock:
+                self._status.update(state="idle", stage=None, duration=duration,
+                                    last_run=pd.Timestamp.now(tz=MARKET_TZ))
+                self._status["runs"] += 1
+            return duration
+
+    @staticmethod
+    def _timed(fn):
+        started = time.perf_counter()
+        try:
+            return fn(), time.perf_counter() - started, None
+        except Exception as e:
+            return None, time.perf_counter() - started, e
+
+    def _record(self, stage, label, seconds, error):
+        with self._lock:
+            self._jobs.append({"stage": stage, "job": label, "seconds": seconds,
+                               "error": None if error is None else f"{type(error).__name__}: {error}"})
+            if error is None:
+                self._status["done"] += 1
+            else:
+                self._status["errors"] += 1
+
+    def _loop(self):
+        reason = "start"
+        while not self._stop.is_set():
+            self.run_once(reason)
+            due, reason = self.next_run()
+            with self._lock:
+                self._status.update(next_run=pd.Timestamp(due), next_reason=reason)
+            wait = (due - datetime.now(MARKET_TZ)).total_seconds()
+            if self._wake.wait(max(wait, 0)):
+                reason = "manual"
+            self._wake.clear()
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def jobs(self):
+        """Per-job durations and errors of the current or last run."""
+        with self._lock:
+            return pd.DataFrame(self._jobs, columns=["stage", "job", "seconds", "error"])